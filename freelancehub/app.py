@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, abort, g, make_response
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -7,23 +7,112 @@ import os
 from datetime import datetime, timedelta
 import json
 import requests
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 import threading
 import time
+import atexit
+import click
+from functools import wraps
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from search import SearchIndex
+from typeahead import TypeaheadIndex
+from pagination import encode_cursor, decode_cursor
+from facets import FacetIndex
+from fuzzy import TrigramIndex
+from trending import SlidingWindowCounter, HotTracker
+from presence import PresenceRegistry
+from message_queue import make_client_manager
+from chat import WriteBehindBuffer, RecentMessages
+from notifier import NotificationDispatcher, summarize
+from response_cache import ResponseCache, make_backend, cache_key
+from identity import IdentityCache, UserIdentity
+from versions import ChangeCounters
+from fragment_cache import FragmentCacheExtension
+from assets import AssetPipeline, build_assets
+from query_budget import init_query_budget, query_budget
+from migrations import Migrations, create_index_online, schema_migrations
+from query_audit import audit, audit_urls
+from engine_profiles import select_profile
+from db_router import ReplicaRouter, RoutingSession, read_replica, copy_sqlite_database
+from synthetic_data import SyntheticMarketplace
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///freelance_marketplace.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
+app.config['SERVICES_PAGE_SIZE'] = int(os.environ.get('SERVICES_PAGE_SIZE', 24))
+# Needed to run more than one worker process, see message_queue.py
+app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')
+# Chat messages are written in batches of up to this many, at most this late
+app.config['CHAT_BATCH_SIZE'] = int(os.environ.get('CHAT_BATCH_SIZE', 50))
+app.config['CHAT_FLUSH_MS'] = int(os.environ.get('CHAT_FLUSH_MS', 250))
+# Notifications for a user are batched over this window, one packet per interval at most
+app.config['NOTIFY_WINDOW_MS'] = int(os.environ.get('NOTIFY_WINDOW_MS', 500))
+app.config['NOTIFY_MIN_INTERVAL_MS'] = int(os.environ.get('NOTIFY_MIN_INTERVAL_MS', 2000))
+# Rendered catalogue pages for anonymous visitors: memory, sqlite:///path or none
+app.config['RESPONSE_CACHE'] = os.environ.get('RESPONSE_CACHE', 'memory')
+app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+# Seconds a logged-in user's id, username and role are served from memory
+app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+# off, warn or raise when a request runs more queries than its route allows
+app.config['QUERY_BUDGET_MODE'] = os.environ.get('QUERY_BUDGET_MODE', 'off')
+# Database engine tuning: auto, sqlite-wal, postgres-pooled or default (see engine_profiles.py)
+app.config['DB_PROFILE'] = os.environ.get('DB_PROFILE', 'auto')
+# Comma-separated read replicas for read-only views, and how far they may lag (see db_router.py)
+app.config['SQLALCHEMY_REPLICA_URIS'] = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+app.config['REPLICA_LAG_SECONDS'] = int(os.environ.get('REPLICA_LAG_SECONDS', 10))
+# Comma-separated usernames allowed to see the /api/.../metrics endpoints
+app.config['ADMIN_USERS'] = {name.strip() for name in os.environ.get('ADMIN_USERS', '').split(',') if name.strip()}
 
 # Initialize SocketIO for real-time features
-socketio = SocketIO(app, cors_allowed_origins="*")
+socket_manager = make_client_manager(app.config['SOCKETIO_MESSAGE_QUEUE'])
+socketio = SocketIO(app, cors_allowed_origins="*", client_manager=socket_manager)
+
+# {% cache %} blocks for markup repeated per service
+app.jinja_env.add_extension(FragmentCacheExtension)
+
+# url_for('static') points at fingerprinted, precompressed builds once
+# `flask build-assets` has run
+asset_pipeline = AssetPipeline(app)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress the scripts and stylesheets."""
+    manifest = build_assets(app.static_folder)
+    asset_pipeline.reload()
+    for source, target in sorted(manifest.items()):
+        print(f"{source} -> {target}")
+
+engine_profile = select_profile(app.config['DB_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_profile.engine_options
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+with app.app_context():
+    engine_profile.install(db.engine)
+
+def engine_settings():
+    """The database engine settings in effect, for the startup log"""
+    settings = [f"{setting}={value}" for setting, value in engine_profile.report(db.engine)]
+    for engine in replica_router.engines:
+        settings.append(f"replica={engine.url.render_as_string(hide_password=True)}")
+    return settings
+
+@app.cli.command('engine-settings')
+def engine_settings_command():
+    """Show the database engine profile and its effective settings."""
+    for line in engine_settings():
+        print(line)
 
-db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+init_query_budget(app)
+
+# Service categories offered in the catalogue
+CATEGORIES = ['Web Development', 'Graphic Design', 'Digital Marketing', 'Writing', 'Video & Animation', 'Music & Audio']
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -61,6 +150,21 @@ class Service(db.Model):
     # Relationships
     orders = db.relationship('Order', backref='service', lazy=True)
     images = db.relationship('ServiceImage', backref='service', lazy=True)
+    
+    __table_args__ = (
+        # Catalogue browsing, newest first, with and without a category
+        db.Index('ix_service_catalogue', 'is_active', 'category', 'created_at'),
+        db.Index('ix_service_recent', 'is_active', 'created_at'),
+        # A freelancer's own services (profile page, stats, cache tags)
+        db.Index('ix_service_freelancer', 'freelancer_id'),
+    )
+    
+    @property
+    def version(self):
+        """Changes whenever the service or its freelancer's profile does"""
+        # Keys this process's fragment cache, so only has to change here:
+        # no database read for services this process has not seen change
+        return change_counters.state([f'service:{self.id}'], load=False)[0]
 
 class ServiceImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -77,6 +181,12 @@ class Order(db.Model):
     requirements = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_order_freelancer_status', 'freelancer_id', 'status'),
+        db.Index('ix_order_client_status', 'client_id', 'status'),
+        db.Index('ix_order_created_at', 'created_at'),
+    )
 
 class Review(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -97,19 +207,779 @@ class Payment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
     
+    __table_args__ = (db.Index('ix_payment_order_id', 'order_id'),)
+    
     # Relationship
     order = db.relationship('Order', backref='payments', lazy=True)
 
+class UserStats(db.Model):
+    """Per-user totals maintained alongside orders and services (see update_user_stats)"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # As a freelancer
+    services_count = db.Column(db.Integer, nullable=False, default=0)
+    orders_received = db.Column(db.Integer, nullable=False, default=0)
+    completed_orders = db.Column(db.Integer, nullable=False, default=0)
+    total_earnings = db.Column(db.Float, nullable=False, default=0)
+    # As a client
+    orders_placed = db.Column(db.Integer, nullable=False, default=0)
+    completed_purchases = db.Column(db.Integer, nullable=False, default=0)
+    total_spent = db.Column(db.Float, nullable=False, default=0)
+
+class Notification(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # per-user, increases by one per notification
+    type = db.Column(db.String(50), default='info')
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('user_id', 'seq'),)
+    
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'type': self.type,
+            'message': self.message,
+            'timestamp': self.created_at.isoformat()
+        }
+
+class NotificationSequence(db.Model):
+    """Last notification sequence number used for each user (see store_notification)"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    last_seq = db.Column(db.Integer, nullable=False, default=0)
+
+class ChatMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # per-order, increases by one per message
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    sender = db.relationship('User')
+    
+    __table_args__ = (db.UniqueConstraint('order_id', 'seq'),)
+    
+    def to_dict(self):
+        return {
+            'order_id': self.order_id,
+            'seq': self.seq,
+            'user_id': self.user_id,
+            'username': self.sender.username,
+            'message': self.message,
+            'timestamp': self.created_at.isoformat()
+        }
+
+class ChangeVersion(db.Model):
+    """Version of each change tag, shared by the workers (see versions.py)"""
+    tag = db.Column(db.String(200), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    modified_at = db.Column(db.DateTime, nullable=False)
+
+class ChatSequence(db.Model):
+    """Last chat sequence number handed out for each order (see next_chat_seq)"""
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), primary_key=True)
+    last_seq = db.Column(db.Integer, nullable=False, default=0)
+
+# INSERT ... ON CONFLICT DO UPDATE, where the database has it
+UPSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+def increment_counter(connection, key_column, key, count_column, **values):
+    """Add one to the counter in the row whose key_column is key, creating
+    the row at 1; returns the new count.  values sets other columns too.
+
+    A single upsert statement on SQLite and Postgres, so concurrent
+    callers always get different counts.
+    """
+    table = key_column.table
+    upsert = UPSERTS.get(connection.dialect.name)
+    if upsert is not None:
+        return connection.execute(
+            upsert(table).values({key_column.name: key, count_column.name: 1, **values}).on_conflict_do_update(
+                index_elements=[key_column], set_={count_column.name: count_column + 1, **values}
+            ).returning(count_column)
+        ).scalar_one()
+    bump = table.update().where(key_column == key).values(
+        {count_column.name: count_column + 1, **values}
+    ).returning(count_column)
+    count = connection.execute(bump).scalar()
+    if count is not None:
+        return count
+    try:
+        with connection.begin_nested():
+            connection.execute(table.insert().values({key_column.name: key, count_column.name: 1, **values}))
+        return 1
+    except IntegrityError:
+        # Another transaction created the row meanwhile; it is there to bump now
+        return connection.execute(bump).scalar_one()
+
+# Schema changes, applied in order by upgrade_database()
+migrations = Migrations(db.metadata)
+
+@migrations.migration('0001', 'Create tables')
+def create_tables(engine):
+    # Only creates what is missing, so databases made by db.create_all() pass through
+    db.metadata.create_all(engine)
+
+@migrations.migration('0002', 'Indexes for catalogue, order and payment lookups')
+def add_lookup_indexes(engine):
+    for index in migrations.indexes('ix_service_catalogue', 'ix_service_recent', 'ix_service_freelancer',
+                                    'ix_order_freelancer_status', 'ix_order_client_status',
+                                    'ix_order_created_at', 'ix_payment_order_id'):
+        create_index_online(engine, index)
+
+@migrations.migration('0003', 'Statistics rows for every user')
+def backfill_user_stats(engine):
+    # Users from before the stats table had no row and were backfilled lazily
+    reconcile_user_stats()
+
+@migrations.migration('0004', 'Per-order chat sequence counters')
+def add_chat_sequences(engine):
+    table = ChatSequence.__table__
+    table.create(engine, checkfirst=True)
+    # Carry on from the numbers already stored
+    with engine.begin() as connection:
+        connection.execute(table.insert().from_select(
+            ['order_id', 'last_seq'],
+            db.select(ChatMessage.order_id, db.func.max(ChatMessage.seq)).where(
+                ChatMessage.order_id.not_in(db.select(table.c.order_id))
+            ).group_by(ChatMessage.order_id)
+        ))
+
+@migrations.migration('0005', 'Per-user notification sequence counters')
+def add_notification_sequences(engine):
+    table = NotificationSequence.__table__
+    table.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        connection.execute(table.insert().from_select(
+            ['user_id', 'last_seq'],
+            db.select(Notification.user_id, db.func.max(Notification.seq)).where(
+                Notification.user_id.not_in(db.select(table.c.user_id))
+            ).group_by(Notification.user_id)
+        ))
+
+@migrations.migration('0006', 'Change versions shared by the workers')
+def add_change_versions(engine):
+    # No rows to start with: a tag without one has never changed
+    ChangeVersion.__table__.create(engine, checkfirst=True)
+
+def upgrade_database():
+    """Bring the schema up to date; replaces db.create_all()"""
+    return migrations.upgrade(db.engine, log=app.logger.info)
+
+@app.cli.command('migrate')
+@click.option('--status', is_flag=True, help='List pending migrations without applying them.')
+def migrate_command(status):
+    """Apply pending schema migrations."""
+    if status:
+        pending = migrations.pending(db.engine)
+        for version, description, _ in pending:
+            print(f"pending  {version}  {description}")
+        print(f"{len(migrations.steps) - len(pending)} applied, {len(pending)} pending")
+        return
+    applied = migrations.upgrade(db.engine, log=print)
+    print(f"Applied {len(applied)} migrations" if applied else "Schema is up to date")
+
+@app.cli.command('audit-queries')
+@click.option('--verbose', is_flag=True, help='Print every plan, not only full scans.')
+def audit_queries_command(verbose):
+    """Explain the queries of every GET route and report full table scans."""
+    service = Service.query.order_by(Service.id).first()
+    order = Order.query.order_by(Order.id).first()
+    url_values = {}
+    if service:
+        url_values['service_id'] = service.id
+    if order:
+        url_values['order_id'] = order.id
+        url_values['user_id'] = order.freelancer_id
+    variants = {
+        'services': [{'category': CATEGORIES[0]}, {'search': 'design'}],
+        'services_page': [{'category': CATEGORIES[0]}],
+        'search_services': [{'q': 'design'}],
+        'typeahead': [{'q': 'de'}],
+        'trending_services': [{'category': CATEGORIES[0]}, {'mode': 'hot'}],
+    }
+    # Anonymously, then as the client and the freelancer of the first order
+    user_ids = [None]
+    if order:
+        user_ids += [order.client_id, order.freelancer_id]
+        variants['batch_user_stats'] = [{'ids': f'{order.client_id},{order.freelancer_id}'}]
+    
+    findings = audit(app, db.engine, audit_urls(app, url_values, variants), user_ids)
+    flagged = [finding for finding in findings if finding['full_scans']]
+    for finding in findings:
+        if not (verbose or finding['full_scans']):
+            continue
+        print(f"{finding['endpoint']}  {finding['url']}")
+        if finding['full_scans']:
+            print(f"  FULL SCAN: {', '.join(finding['full_scans'])}")
+        print('  ' + ' '.join(finding['statement'].split()))
+        for line in finding['plan']:
+            print(f"    {line}")
+    print(f"{len(findings)} distinct queries, {len(flagged)} with full table scans")
+
+# Relationships each kind of page renders, loaded together with its rows
+# rather than by one lazy query per row.  (Built on use: the backrefs only
+# exist once the mappers are configured.)
+LOAD_STRATEGIES = {
+    'service_cards': lambda: [db.joinedload(Service.freelancer)],
+    'service_page': lambda: [db.joinedload(Service.freelancer)],
+    'order_rows': lambda: [db.joinedload(Order.service).joinedload(Service.freelancer)],
+}
+
+def loading(page):
+    """Query options that eager-load what a kind of page shows"""
+    return LOAD_STRATEGIES[page]()
+
+# User statistics maintenance
+STAT_FIELDS = ('services_count', 'orders_received', 'completed_orders', 'total_earnings',
+               'orders_placed', 'completed_purchases', 'total_spent')
+
+def order_contribution(freelancer_id, client_id, status, amount):
+    """What one order adds to the stats of its freelancer and client"""
+    completed = status == 'completed'
+    amount = (amount or 0) if completed else 0
+    return [
+        (freelancer_id, {'orders_received': 1, 'completed_orders': int(completed), 'total_earnings': amount}),
+        (client_id, {'orders_placed': 1, 'completed_purchases': int(completed), 'total_spent': amount}),
+    ]
+
+def service_contribution(freelancer_id, is_active):
+    """What one service adds to the stats of its freelancer"""
+    return [(freelancer_id, {'services_count': 1 if is_active in (None, True) else 0})]
+
+def contribution(obj, previous=False):
+    """Stats contribution of an order or service, before or after the flush"""
+    def value(name):
+        if previous:
+            history = db.inspect(obj).attrs[name].history
+            if history.deleted:
+                return history.deleted[0]
+        return getattr(obj, name)
+    if isinstance(obj, Order):
+        return order_contribution(value('freelancer_id'), value('client_id'),
+                                  value('status') or 'pending', value('total_amount'))
+    return service_contribution(value('freelancer_id'), value('is_active'))
+
+def compute_user_stats(user_ids=None):
+    """Aggregate user statistics from scratch with three grouped queries"""
+    stats = {}
+    def row(user_id):
+        return stats.setdefault(user_id, dict.fromkeys(STAT_FIELDS, 0))
+    completed = db.case((Order.status == 'completed', 1), else_=0)
+    earned = db.case((Order.status == 'completed', Order.total_amount), else_=0)
+    
+    services = db.session.query(Service.freelancer_id, db.func.count(Service.id)).filter(Service.is_active == True)
+    received = db.session.query(Order.freelancer_id, db.func.count(Order.id), db.func.sum(completed), db.func.sum(earned))
+    placed = db.session.query(Order.client_id, db.func.count(Order.id), db.func.sum(completed), db.func.sum(earned))
+    if user_ids is not None:
+        services = services.filter(Service.freelancer_id.in_(user_ids))
+        received = received.filter(Order.freelancer_id.in_(user_ids))
+        placed = placed.filter(Order.client_id.in_(user_ids))
+    
+    for user_id, count in services.group_by(Service.freelancer_id):
+        row(user_id)['services_count'] = count
+    for user_id, count, done, amount in received.group_by(Order.freelancer_id):
+        row(user_id).update(orders_received=count, completed_orders=done or 0, total_earnings=amount or 0)
+    for user_id, count, done, amount in placed.group_by(Order.client_id):
+        row(user_id).update(orders_placed=count, completed_purchases=done or 0, total_spent=amount or 0)
+    
+    for user_id in user_ids or ():
+        row(user_id)
+    return stats
+
+def lock_for_recount():
+    """Hold off writes to users, services, orders and user_stats until the
+    session's transaction ends"""
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(
+            'LOCK TABLE "user", service, "order", user_stats IN SHARE ROW EXCLUSIVE MODE'
+        )
+    elif connection.dialect.name == 'sqlite':
+        dbapi_connection = connection.connection.dbapi_connection
+        # A transaction that has written already holds the write lock
+        if not dbapi_connection.in_transaction:
+            dbapi_connection.execute('BEGIN IMMEDIATE')
+
+def reconcile_user_stats():
+    """Recount every user's statistics from orders and services
+
+    Safe on a live site: the count and the rewrite happen in one
+    transaction holding off the writes that would change the counts, so no
+    registration or update_user_stats delta can land in between, and rows
+    are updated in place rather than deleted and inserted again.
+    """
+    lock_for_recount()
+    table = UserStats.__table__
+    stats = compute_user_stats()
+    user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+    existing = {user_id for (user_id,) in db.session.query(UserStats.user_id)}
+    rows = [dict(stats.get(user_id, dict.fromkeys(STAT_FIELDS, 0)), user_id=user_id) for user_id in user_ids]
+    inserts = [row for row in rows if row['user_id'] not in existing]
+    updates = [dict(row, row_user_id=row.pop('user_id')) for row in rows if row['user_id'] in existing]
+    if updates:
+        db.session.execute(table.update().where(table.c.user_id == db.bindparam('row_user_id')), updates)
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+    db.session.commit()
+    return len(user_ids)
+
+@app.cli.command('rebuild-user-stats')
+def rebuild_user_stats_command():
+    """Recompute every user's statistics from scratch."""
+    print(f"Rebuilt statistics for {reconcile_user_stats()} users")
+
+def generate_data(users, services, orders, seed=0, end=None, chunk_size=10000, reset=False, log=print):
+    """Bulk-insert a synthetic data set (see synthetic_data.py); returns rows per table"""
+    generator = SyntheticMarketplace(
+        {'user': User.__table__, 'service': Service.__table__, 'order': Order.__table__,
+         'payment': Payment.__table__, 'review': Review.__table__},
+        CATEGORIES, users, services, orders, seed=seed, end=end
+    )
+    if reset:
+        db.drop_all()
+        schema_migrations.drop(db.engine, checkfirst=True)
+    upgrade_database()
+    counts = generator.write(db.engine, chunk_size=chunk_size, log=log)
+    # The inserts bypass the session hooks that keep user_stats current
+    log(f"Rebuilt statistics for {reconcile_user_stats()} users")
+    return counts
+
+@app.cli.command('generate-data')
+@click.option('--users', type=int, default=1000, show_default=True)
+@click.option('--services', type=int, default=5000, show_default=True)
+@click.option('--orders', type=int, default=20000, show_default=True, help='Payments and reviews follow from the orders.')
+@click.option('--seed', type=int, default=0, show_default=True)
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Last day of the generated year; defaults to today.')
+@click.option('--chunk-size', type=int, default=10000, show_default=True, help='Rows per transaction.')
+@click.option('--reset', is_flag=True, help='Drop all tables first instead of appending.')
+def generate_data_command(users, services, orders, seed, end, chunk_size, reset):
+    """Fill the database with synthetic users, services and orders for load testing."""
+    if reset:
+        click.confirm(f"Drop every table in {db.engine.url.render_as_string(hide_password=True)}?", abort=True)
+    try:
+        generate_data(users, services, orders, seed=seed, end=end, chunk_size=chunk_size, reset=reset)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    print("Restart running servers: their in-memory indexes do not see bulk inserts")
+
+@event.listens_for(db.session, 'after_flush')
+def update_user_stats(session, flush_context):
+    """Apply the stats changes of this flush in the same transaction"""
+    deltas = {}
+    def add(contributions, sign):
+        for user_id, values in contributions:
+            row = deltas.setdefault(user_id, dict.fromkeys(STAT_FIELDS, 0))
+            for field, value in values.items():
+                row[field] += sign * value
+    
+    new_users = []
+    for obj in session.new:
+        if isinstance(obj, User):
+            new_users.append(obj.id)
+        elif isinstance(obj, (Order, Service)):
+            add(contribution(obj), 1)
+    for obj in session.dirty:
+        if isinstance(obj, (Order, Service)) and session.is_modified(obj):
+            add(contribution(obj, previous=True), -1)
+            add(contribution(obj), 1)
+    for obj in session.deleted:
+        if isinstance(obj, (Order, Service)):
+            add(contribution(obj, previous=True), -1)
+    
+    if not deltas and not new_users:
+        return
+    
+    connection = session.connection()
+    table = UserStats.__table__
+    if new_users:
+        connection.execute(table.insert(), [
+            dict(dict.fromkeys(STAT_FIELDS, 0), user_id=user_id) for user_id in new_users
+        ])
+    for user_id, row in deltas.items():
+        changes = {field: table.c[field] + value for field, value in row.items() if value}
+        if not changes or user_id is None:
+            continue
+        # Every user has a row (migration 0003 backfilled the older ones), so
+        # this only ever updates: inserting here could race another request
+        result = connection.execute(table.update().where(table.c.user_id == user_id).values(changes))
+        if result.rowcount == 0:
+            app.logger.warning('No user_stats row for user %s; run `flask rebuild-user-stats`', user_id)
+
+# Catalogue indexes, kept in memory and updated as services change
+search_index = SearchIndex()
+typeahead_index = TypeaheadIndex()
+facet_index = FacetIndex()
+trigram_index = TrigramIndex()
+catalogue_indexes = [search_index, typeahead_index, facet_index, trigram_index]
+
+def service_document(service, freelancer=None, skills=None):
+    """Flatten a service into the plain dict the catalogue indexes consume"""
+    return {
+        'id': service.id,
+        'title': service.title,
+        'description': service.description,
+        'category': service.category,
+        'price': service.price,
+        'delivery_time': service.delivery_time,
+        'freelancer_id': service.freelancer_id,
+        'created_at': service.created_at,
+        'is_active': service.is_active,
+        'freelancer': freelancer,
+        'skills': skills,
+    }
+
+def catalogue_documents():
+    """Load every active service with its freelancer's name and skills in one query"""
+    rows = db.session.query(Service, User.username, User.skills).join(
+        User, Service.freelancer_id == User.id
+    ).filter(Service.is_active == True).all()
+    return [service_document(service, username, skills) for service, username, skills in rows]
+
+def ensure_catalogue_indexes():
+    """Build any catalogue index that has not been loaded yet"""
+    pending = [index for index in catalogue_indexes if not index.built]
+    if pending:
+        with replica_router.primary():
+            docs = catalogue_documents()
+        for index in pending:
+            index.rebuild(docs)
+
+def services_in_order(service_ids):
+    """Fetch active services by id, preserving the order of service_ids"""
+    if not service_ids:
+        return []
+    found = Service.query.options(*loading('service_cards')).filter(
+        Service.id.in_(service_ids), Service.is_active == True
+    ).all()
+    by_id = {service.id: service for service in found}
+    return [by_id[service_id] for service_id in service_ids if service_id in by_id]
+
+@event.listens_for(db.session, 'after_flush')
+def track_service_changes(session, flush_context):
+    """Snapshot flushed services so the indexes can be updated on commit"""
+    changes = session.info.setdefault('service_changes', {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Service):
+            freelancer = session.get(User, obj.freelancer_id)
+            changes[obj.id] = service_document(
+                obj,
+                freelancer.username if freelancer else None,
+                freelancer.skills if freelancer else None
+            )
+    for obj in session.deleted:
+        if isinstance(obj, Service):
+            changes[obj.id] = None
+
+@event.listens_for(db.session, 'after_commit')
+def apply_service_changes(session):
+    """Push committed service changes into the catalogue indexes of every worker"""
+    changes = session.info.pop('service_changes', None)
+    if changes:
+        update_catalogue_indexes(changes)
+        broadcast_app_event('service_changes', changes)
+
+def update_catalogue_indexes(changes):
+    """Apply {service_id: document or None} to the local catalogue indexes"""
+    for service_id, doc in changes.items():
+        for index in catalogue_indexes:
+            if not index.built:
+                continue
+            if doc and doc['is_active']:
+                index.add(doc)
+            else:
+                index.remove(service_id)
+
+# Orders per service over the last week, and the decayed "hot" ranking per
+# category, for the trending endpoint
+trending_counter = SlidingWindowCounter(window_hours=7 * 24)
+hot_tracker = HotTracker(capacity=64, half_life_hours=24)
+
+def ensure_trending_counter():
+    """Load the last week of orders into the trending counters if not done yet"""
+    if not trending_counter.built or not hot_tracker.built:
+        since = datetime.utcnow() - timedelta(hours=trending_counter.window_hours)
+        with replica_router.primary():
+            rows = db.session.query(Order.service_id, Order.created_at, Service.category).join(
+                Service, Order.service_id == Service.id
+            ).filter(Order.created_at >= since).all()
+        trending_counter.rebuild((service_id, created_at) for service_id, created_at, category in rows)
+        hot_tracker.rebuild((service_id, category, created_at) for service_id, created_at, category in rows)
+
+@event.listens_for(db.session, 'after_flush')
+def track_new_orders(session, flush_context):
+    """Remember flushed orders so they are counted once the commit succeeds"""
+    new_orders = session.info.setdefault('new_orders', [])
+    for obj in session.new:
+        if isinstance(obj, Order):
+            service = session.get(Service, obj.service_id)
+            new_orders.append((obj.service_id, obj.created_at, service.category if service else None))
+
+@event.listens_for(db.session, 'after_commit')
+def count_new_orders(session):
+    new_orders = session.info.pop('new_orders', None)
+    if new_orders:
+        update_trending_counters(new_orders)
+        broadcast_app_event('new_orders', new_orders)
+
+def update_trending_counters(new_orders):
+    """Count (service_id, created_at, category) orders in the local trending counters"""
+    for service_id, created_at, category in new_orders:
+        if trending_counter.built:
+            trending_counter.record(service_id, created_at)
+        if hot_tracker.built:
+            hot_tracker.record(service_id, category, created_at)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_pending_changes(session):
+    session.info.pop('service_changes', None)
+    session.info.pop('new_orders', None)
+    session.info.pop('cache_tags', None)
+    session.info.pop('change_versions', None)
+    session.info.pop('changed_users', None)
+
+def load_indexes():
+    """Warm every in-memory index at startup instead of on the first request"""
+    ensure_catalogue_indexes()
+    ensure_trending_counter()
+    if socket_manager is not None:
+        # Listen for other workers' updates from now on
+        socket_manager.start()
+
+# With several workers, each keeps its own in-memory indexes; changes committed
+# on one worker are relayed to the others over the Socket.IO message queue.
+def broadcast_app_event(name, payload):
+    if socket_manager is not None:
+        socket_manager.publish_app_event(name, payload)
+
+def handle_app_event(name, payload):
+    """Apply an index update published by another worker"""
+    if name == 'service_changes':
+        update_catalogue_indexes(payload)
+    elif name == 'new_orders':
+        update_trending_counters(payload)
+    elif name == 'changed_tags':
+        # Record first (see cached_page).  A shared backend was invalidated by
+        # the sender already, but a page this worker was rendering meanwhile
+        # may have been stored after that
+        change_counters.record({tag: (version, datetime.fromisoformat(modified))
+                                for tag, (version, modified) in payload.items()})
+        response_cache.invalidate(list(payload))
+    elif name == 'users_changed':
+        identity_cache.invalidate(payload)
+
+if socket_manager is not None:
+    socket_manager.on_app_event = handle_app_event
+
+# Response cache for anonymous catalogue pages, and change counters for ETags.
+# Both are driven by the tags of what each transaction changed.
+response_cache = ResponseCache(make_backend(app.config['RESPONSE_CACHE'], app.config['RESPONSE_CACHE_SIZE']))
+def load_change_versions(tags):
+    """Read tag versions from the primary: a replica's may be behind"""
+    table = ChangeVersion.__table__
+    # Warms change_counters once per tag and process, not any route's cost
+    with db.engine.connect().execution_options(query_budget=False) as connection:
+        rows = connection.execute(db.select(table.c.tag, table.c.version, table.c.modified_at)
+                                  .where(table.c.tag.in_(tags)))
+        return {tag: (version, modified) for tag, version, modified in rows}
+
+change_counters = ChangeCounters(load_change_versions)
+
+def show_tags(tags):
+    """Record that the current response shows tags (see shown_data_changed_within)"""
+    g.page_tags = g.get('page_tags', frozenset()) | frozenset(tags)
+    return tags
+
+def shown_data_changed_within(seconds):
+    """Whether anything the current response shows changed in the last seconds"""
+    tags = g.get('page_tags')
+    if not tags:
+        return False
+    return change_counters.changed_within(tags, seconds)
+
+# Read-only views read from the replicas, when there are any, unless the
+# replicas may not have caught up with what the request needs
+replica_router = ReplicaRouter(app, db, engine_profile.engine_options, recently_changed=shown_data_changed_within)
+
+@app.cli.command('sync-replica')
+@click.option('--interval', type=float, default=0, help='Keep copying every this many seconds.')
+def sync_replica_command(interval):
+    """Copy the SQLite database to the SQLite read replicas."""
+    targets = [engine.url.database for engine in replica_router.engines if engine.dialect.name == 'sqlite']
+    if db.engine.dialect.name != 'sqlite' or not targets:
+        raise click.ClickException('sync-replica copies an SQLite database to SQLite replicas in DATABASE_REPLICA_URLS')
+    while True:
+        for target in targets:
+            copy_sqlite_database(db.engine.url.database, target)
+        print(f"{datetime.now():%H:%M:%S} copied to {', '.join(targets)}")
+        if not interval:
+            break
+        time.sleep(interval)
+
+@event.listens_for(db.session, 'after_flush')
+def track_cache_tags(session, flush_context):
+    """Collect the tags of everything the flush changed"""
+    tags = session.info.setdefault('cache_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Service):
+            tags.update(['catalogue', f'service:{obj.id}', f'category:{obj.category}', f'stats:{obj.freelancer_id}'])
+            # A service moved out of a category leaves that category's pages too
+            tags.update(f'category:{category}' for category in db.inspect(obj).attrs.category.history.deleted)
+        elif isinstance(obj, Order):
+            tags.update([f'stats:{obj.client_id}', f'stats:{obj.freelancer_id}', f'orders:{obj.client_id}'])
+            if obj in session.new:
+                tags.add('trending')
+        elif isinstance(obj, Notification):
+            tags.add(f'notifications:{obj.user_id}')
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            tags.update(['catalogue', f'user:{obj.id}'])
+            # Service pages show their freelancer's profile
+            with session.no_autoflush:
+                service_ids = session.query(Service.id).filter_by(freelancer_id=obj.id)
+                tags.update(f'service:{service_id}' for (service_id,) in service_ids)
+
+@event.listens_for(db.session, 'before_commit')
+def bump_change_versions(session):
+    """Bump the shared versions of the changed tags in the committing transaction"""
+    # Commit flushes after this hook; flush now so every change has its tags
+    session.flush()
+    tags = session.info.get('cache_tags')
+    if not tags:
+        return
+    table = ChangeVersion.__table__
+    now = datetime.utcnow()
+    connection = session.connection(bind_arguments={'bind': db.engine})
+    # In sorted order, so concurrent transactions lock the rows in the same order
+    session.info['change_versions'] = {
+        tag: (increment_counter(connection, table.c.tag, tag, table.c.version, modified_at=now), now)
+        for tag in sorted(tags)
+    }
+
+@event.listens_for(db.session, 'after_commit')
+def apply_changed_tags(session):
+    """Drop cached pages and record the versions of anything the transaction changed"""
+    tags = session.info.pop('cache_tags', None)
+    versions = session.info.pop('change_versions', None)
+    if tags:
+        # Record first (see cached_page)
+        change_counters.record(versions or {})
+        response_cache.invalidate(tags)
+        broadcast_app_event('changed_tags', {tag: [version, modified.isoformat()]
+                                             for tag, (version, modified) in (versions or {}).items()})
+
+def conditional_get(tags, extra=None, private=False):
+    """Answer conditional GETs for a view from the change counters
+
+    tags(**view_args) names what the response shows and extra(), if given,
+    anything else it depends on.  A request whose If-None-Match is still
+    current gets a 304 before the view runs.  If-Modified-Since is not
+    honoured: Last-Modified has whole seconds, so a client that fetched in
+    the same second as a later change would keep the stale copy.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            etag, last_modified = change_counters.etag(show_tags(tags(**view_args)), extra() if extra else '')
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(**view_args))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            if private:
+                response.cache_control.private = True
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+def cached_page(tags, on_hit=None):
+    """Serve a view's response from the cache to anonymous GET requests
+
+    tags(**view_args) names what the page shows.  A view can set g.cache_meta
+    to something on_hit(meta) should replay when the page is served from cache.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            page_tags = show_tags(tags(**view_args))
+            if (not response_cache.enabled or request.method != 'GET'
+                    or current_user.is_authenticated or '_flashes' in session):
+                return view(**view_args)
+            
+            key = cache_key(request.path, request.args)
+            version = change_counters.state(page_tags)[0]
+            cached = response_cache.get(key)
+            if cached is not None:
+                body, status, headers, meta = cached
+                if on_hit is not None and meta is not None:
+                    on_hit(meta)
+                response = app.response_class(body, status=status, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+            
+            response = make_response(view(**view_args))
+            # A write committed while the page rendered may not be in it, and
+            # its invalidation may have run before the store: skip the store,
+            # or undo it.  Writes bump the versions before invalidating, so
+            # one that the second check misses comes after the store.
+            if (response.status_code == 200 and not session.modified
+                    and change_counters.state(page_tags)[0] == version):
+                headers = [(name, value) for name, value in response.headers
+                           if name not in ('Set-Cookie', 'Content-Length')]
+                response_cache.set(key, (response.get_data(), response.status_code, headers, g.get('cache_meta')),
+                                   page_tags)
+                if change_counters.state(page_tags)[0] != version:
+                    response_cache.invalidate(page_tags)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+identity_cache = IdentityCache(ttl=app.config['IDENTITY_CACHE_TTL'])
+
+def load_full_user(user_id):
+    return db.session.get(User, user_id)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """Load the logged-in user's identity, from memory when possible"""
+    user_id = int(user_id)
+    fields = identity_cache.get(user_id)
+    if fields is None:
+        row = db.session.query(User.id, User.username, User.is_freelancer).filter_by(id=user_id).first()
+        if row is None:
+            return None
+        fields = tuple(row)
+        identity_cache.set(user_id, fields)
+    return UserIdentity(fields, load_full_user)
+
+@event.listens_for(db.session, 'after_flush')
+def track_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_users', set())
+    changed.update(obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User))
+
+@event.listens_for(db.session, 'after_commit')
+def forget_changed_users(session):
+    """Drop cached identities of users edited or deleted in the transaction"""
+    changed = session.info.pop('changed_users', None)
+    if changed:
+        identity_cache.invalidate(changed)
+        broadcast_app_event('users_changed', sorted(changed))
 
 # Routes
 @app.route('/')
+@read_replica
+@query_budget(3)
+@cached_page(lambda: ['catalogue'])
 def index():
-    categories = ['Web Development', 'Graphic Design', 'Digital Marketing', 'Writing', 'Video & Animation', 'Music & Audio']
-    featured_services = Service.query.filter_by(is_active=True).limit(8).all()
-    return render_template('index.html', categories=categories, featured_services=featured_services)
+    featured_services = Service.query.options(*loading('service_cards')).filter_by(is_active=True).limit(8).all()
+    return render_template('index.html', categories=CATEGORIES, featured_services=featured_services)
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -163,32 +1033,155 @@ def logout():
     return redirect(url_for('index'))
 
 @app.route('/profile')
+@query_budget(6)
 @login_required
 def profile():
-    return render_template('profile.html')
+    orders = Order.query.options(*loading('order_rows')).filter_by(client_id=current_user.id) \
+        .order_by(Order.created_at.desc()).all()
+    return render_template('profile.html', orders=orders)
 
-@app.route('/services')
-def services():
-    category = request.args.get('category', '')
-    search = request.args.get('search', '')
+def ranked_search(search, limit=None):
+    """Rank services for a search, retrying with typos corrected if nothing matches
+
+    Returns the ranked ids and the corrected query (None if it was not needed).
+    """
+    ranked_ids = search_index.search(search, limit=limit)
+    if ranked_ids:
+        return ranked_ids, None
+    corrected = trigram_index.suggest(search)
+    if corrected:
+        return search_index.search(corrected, limit=limit), corrected
+    return [], None
+
+def catalogue_page(category, search, after, page_size):
+    """Return one page of the catalogue as a dict of services, the next-page
+    cursor, facet counts and the typo-corrected search (if one was used)
+
+    Browsing is keyset-paginated on (created_at, id), so every page costs the
+    same index range scan.  Search results come ranked from the in-memory
+    index and the cursor is simply the position in that ranking.  Facet
+    counts are taken before the category filter so the dropdown can show how
+    many results each category would give.
+    """
+    cursor = decode_cursor(after) or {}
+    ensure_catalogue_indexes()
     
-    query = Service.query.filter_by(is_active=True)
+    if search:
+        ranked_ids, corrected = ranked_search(search)
+        facets = facet_index.counts(ranked_ids)
+        ranked_ids = facet_index.filter(ranked_ids, category=category)
+        offset = cursor.get('offset', 0) if isinstance(cursor.get('offset'), int) else 0
+        page_ids = ranked_ids[offset:offset + page_size]
+        next_cursor = encode_cursor(offset=offset + page_size) if offset + page_size < len(ranked_ids) else None
+        return {
+            'services': services_in_order(page_ids),
+            'next': next_cursor,
+            'facets': facets,
+            'corrected': corrected
+        }
+    
+    query = Service.query.options(*loading('service_cards')).filter_by(is_active=True)
     
     if category:
         query = query.filter_by(category=category)
     
-    if search:
-        query = query.filter(Service.title.contains(search) | Service.description.contains(search))
+    if isinstance(cursor.get('created_at'), datetime) and isinstance(cursor.get('id'), int):
+        query = query.filter(db.or_(
+            Service.created_at < cursor['created_at'],
+            db.and_(Service.created_at == cursor['created_at'], Service.id < cursor['id'])
+        ))
     
-    services = query.order_by(Service.created_at.desc()).all()
-    categories = ['Web Development', 'Graphic Design', 'Digital Marketing', 'Writing', 'Video & Animation', 'Music & Audio']
+    rows = query.order_by(Service.created_at.desc(), Service.id.desc()).limit(page_size + 1).all()
+    services = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        next_cursor = encode_cursor(created_at=services[-1].created_at, id=services[-1].id)
+    return {'services': services, 'next': next_cursor, 'facets': facet_index.counts(), 'corrected': None}
+
+def page_size_arg():
+    """Read ?limit= clamped to a sane range, defaulting to the configured size"""
+    default = app.config['SERVICES_PAGE_SIZE']
+    return max(1, min(request.args.get('limit', default, type=int), 100))
+
+def record_cached_search(meta):
+    typeahead_index.record_query(meta['query'])
+
+@app.route('/services')
+@read_replica
+@query_budget(3)
+@cached_page(lambda: ['catalogue', 'category:%s' % request.args.get('category', '')],
+             on_hit=record_cached_search)
+def services():
+    category = request.args.get('category', '')
+    search = request.args.get('search', '')
+    after = request.args.get('after', '')
+    
+    page = catalogue_page(category, search, after, page_size_arg())
+    if search and page['services'] and not after:
+        typeahead_index.record_query(page['corrected'] or search)
+        g.cache_meta = {'query': page['corrected'] or search}
+    
+    return render_template('services.html', services=page['services'], categories=CATEGORIES,
+                           current_category=category, search=search, next_cursor=page['next'],
+                           facets=page['facets'], corrected=page['corrected'])
+
+@app.route('/api/services')
+@read_replica
+@query_budget(3)
+def services_page():
+    """Get one page of the catalogue for infinite scroll"""
+    page = catalogue_page(
+        request.args.get('category', ''),
+        request.args.get('search', ''),
+        request.args.get('after', ''),
+        page_size_arg()
+    )
     
-    return render_template('services.html', services=services, categories=categories, current_category=category, search=search)
+    return jsonify({
+        'services': [{
+            'id': service.id,
+            'title': service.title,
+            'description': service.description[:150],
+            'truncated': len(service.description) > 150,
+            'category': service.category,
+            'price': service.price,
+            'delivery_time': service.delivery_time,
+            'freelancer': service.freelancer.username,
+            'created_at': service.created_at.isoformat()
+        } for service in page['services']],
+        'next': page['next'],
+        'facets': page['facets'],
+        'corrected': page['corrected'],
+        # Cards show an Order button to clients, as services.html does
+        'can_order': current_user.is_authenticated and not current_user.is_freelancer
+    })
+
+@app.route('/api/facets')
+def catalogue_facets():
+    """Get active-service counts per category, price band and delivery band"""
+    ensure_catalogue_indexes()
+    return jsonify(facet_index.counts())
+
+def service_page_tags(service_id):
+    tags = [f'service:{service_id}']
+    if current_user.is_authenticated:
+        # The chat box depends on the viewer's orders
+        tags += [f'user:{current_user.id}', f'orders:{current_user.id}']
+    return tags
 
 @app.route('/service/<int:service_id>')
+@read_replica
+@query_budget(4)
+@conditional_get(service_page_tags)
+@cached_page(service_page_tags)
 def service_detail(service_id):
-    service = Service.query.get_or_404(service_id)
-    return render_template('service_detail.html', service=service)
+    service = Service.query.options(*loading('service_page')).filter_by(id=service_id).first_or_404()
+    chat_order = None
+    if current_user.is_authenticated:
+        # Chat happens on the client's most recent order of this service
+        chat_order = Order.query.filter_by(service_id=service.id, client_id=current_user.id) \
+            .order_by(Order.created_at.desc()).first()
+    return render_template('service_detail.html', service=service, chat_order=chat_order)
 
 @app.route('/create_service', methods=['GET', 'POST'])
 @login_required
@@ -218,15 +1211,18 @@ def create_service():
         flash('Service created successfully!')
         return redirect(url_for('profile'))
     
-    categories = ['Web Development', 'Graphic Design', 'Digital Marketing', 'Writing', 'Video & Animation', 'Music & Audio']
-    return render_template('create_service.html', categories=categories)
+    return render_template('create_service.html', categories=CATEGORIES)
 
 @app.route('/api/search_services')
+@read_replica
+@query_budget(2)
 def search_services():
+    """Search services for the live-search dropdown, with a typo-corrected
+    query in did_you_mean when the search as typed found nothing"""
     query = request.args.get('q', '')
-    services = Service.query.filter(
-        Service.title.contains(query) | Service.description.contains(query)
-    ).filter_by(is_active=True).limit(10).all()
+    ensure_catalogue_indexes()
+    ranked_ids, corrected = ranked_search(query, limit=10)
+    services = services_in_order(ranked_ids)
     
     results = []
     for service in services:
@@ -237,125 +1233,289 @@ def search_services():
             'freelancer': service.freelancer.username
         })
     
-    return jsonify(results)
+    return jsonify({'results': results, 'did_you_mean': corrected})
+
+@app.route('/api/typeahead')
+def typeahead():
+    """Suggest services and popular searches for the live-search dropdown"""
+    ensure_catalogue_indexes()
+    return jsonify(typeahead_index.suggest(request.args.get('q', ''), limit=10))
 
 # New Dynamic API Endpoints
 @app.route('/api/trending_services')
+@read_replica
+@query_budget(2)
+@conditional_get(lambda: ['trending', 'catalogue'],
+                 # The weekly window slides and hot scores decay by the hour
+                 extra=lambda: datetime.utcnow().strftime('%Y%m%d%H'))
 def trending_services():
-    """Get trending services based on recent orders"""
-    recent_orders = Order.query.filter(
-        Order.created_at >= datetime.utcnow() - timedelta(days=7)
-    ).all()
+    """Get trending services based on recent orders
+    
+    ?mode=week (default) ranks by exact order counts over the last 7 days,
+    ?mode=hot by a score where each order's weight halves every 24 hours.
+    ?category= restricts either ranking to one category.
+    """
+    category = request.args.get('category', '')
+    mode = request.args.get('mode', 'week')
+    ensure_trending_counter()
     
-    service_counts = {}
-    for order in recent_orders:
-        service_counts[order.service_id] = service_counts.get(order.service_id, 0) + 1
+    # Ask for a few spare entries in case some top services were deactivated
+    if mode == 'hot':
+        ranking = [(service_id, score) for service_id, score, error in hot_tracker.top(12, category=category or None)]
+    elif category:
+        ensure_catalogue_indexes()
+        ranking = trending_counter.top(12, where=lambda service_id: facet_index.category_of(service_id) == category)
+    else:
+        ranking = trending_counter.top(12)
     
-    trending_service_ids = sorted(service_counts.items(), key=lambda x: x[1], reverse=True)[:6]
+    services = Service.query.options(*loading('service_cards')).filter(
+        Service.id.in_([service_id for service_id, score in ranking]),
+        Service.is_active == True
+    ).all()
+    services_by_id = {service.id: service for service in services}
     
     trending_services = []
-    for service_id, count in trending_service_ids:
-        service = Service.query.get(service_id)
-        if service and service.is_active:
-            trending_services.append({
+    for service_id, score in ranking:
+        service = services_by_id.get(service_id)
+        if service and len(trending_services) < 6:
+            entry = {
                 'id': service.id,
                 'title': service.title,
                 'price': service.price,
                 'freelancer': service.freelancer.username,
-                'order_count': count
-            })
+                'order_count': trending_counter.count(service_id)
+            }
+            if mode == 'hot':
+                entry['hot_score'] = round(score, 2)
+            trending_services.append(entry)
     
     return jsonify(trending_services)
 
 @app.route('/api/user_stats/<int:user_id>')
+@read_replica
+@conditional_get(lambda user_id: [f'stats:{user_id}', f'user:{user_id}'])
 def user_stats(user_id):
     """Get user statistics"""
-    user = User.query.get_or_404(user_id)
-    
-    if user.is_freelancer:
-        services_count = Service.query.filter_by(freelancer_id=user_id, is_active=True).count()
-        orders_received = Order.query.filter_by(freelancer_id=user_id).count()
-        completed_orders = Order.query.filter_by(freelancer_id=user_id, status='completed').count()
-        total_earnings = db.session.query(db.func.sum(Order.total_amount)).filter_by(
-            freelancer_id=user_id, status='completed'
-        ).scalar() or 0
-        
-        return jsonify({
-            'services_count': services_count,
-            'orders_received': orders_received,
-            'completed_orders': completed_orders,
-            'total_earnings': total_earnings,
-            'completion_rate': (completed_orders / orders_received * 100) if orders_received > 0 else 0
-        })
-    else:
-        orders_placed = Order.query.filter_by(client_id=user_id).count()
-        completed_orders = Order.query.filter_by(client_id=user_id, status='completed').count()
-        total_spent = db.session.query(db.func.sum(Order.total_amount)).filter_by(
-            client_id=user_id, status='completed'
-        ).scalar() or 0
-        
-        return jsonify({
-            'orders_placed': orders_placed,
-            'completed_orders': completed_orders,
-            'total_spent': total_spent
-        })
+    row = db.session.query(User.is_freelancer, UserStats).outerjoin(
+        UserStats, UserStats.user_id == User.id
+    ).filter(User.id == user_id).first()
+    if row is None:
+        abort(404)
+    
+    is_freelancer, stats = row
+    return jsonify(user_stats_payload(is_freelancer, stats))
+
+def batch_stats_tags():
+    user_ids = sorted({part.strip() for part in request.args.get('ids', '').split(',') if part.strip().isdigit()})
+    return [tag for user_id in user_ids for tag in (f'stats:{user_id}', f'user:{user_id}')]
+
+@app.route('/api/user_stats')
+@read_replica
+@conditional_get(batch_stats_tags)
+def batch_user_stats():
+    """Get statistics for several users at once: /api/user_stats?ids=1,2,3"""
+    try:
+        user_ids = {int(part) for part in request.args.get('ids', '').split(',') if part.strip()}
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+    if len(user_ids) > 100:
+        return jsonify({'error': 'At most 100 ids per request'}), 400
+    if not user_ids:
+        return jsonify({})
+    
+    rows = db.session.query(User.id, User.is_freelancer, UserStats).outerjoin(
+        UserStats, UserStats.user_id == User.id
+    ).filter(User.id.in_(user_ids)).all()
+    
+    results = {}
+    for user_id, is_freelancer, stats in rows:
+        results[str(user_id)] = user_stats_payload(is_freelancer, stats)
+    
+    return jsonify(results)
+
+def user_stats_payload(is_freelancer, stats):
+    """Shape a UserStats row the way the profile widgets expect"""
+    if stats is None:
+        # Every user has a row (migration 0003); only a lagging replica can
+        # miss a new one, and a new user has nothing to count yet
+        stats = UserStats(**dict.fromkeys(STAT_FIELDS, 0))
+    if is_freelancer:
+        return {
+            'services_count': stats.services_count,
+            'orders_received': stats.orders_received,
+            'completed_orders': stats.completed_orders,
+            'total_earnings': stats.total_earnings,
+            'completion_rate': (stats.completed_orders / stats.orders_received * 100) if stats.orders_received > 0 else 0
+        }
+    return {
+        'orders_placed': stats.orders_placed,
+        'completed_orders': stats.completed_purchases,
+        'total_spent': stats.total_spent
+    }
 
 @app.route('/api/notifications')
 @login_required
+@conditional_get(lambda: [f'notifications:{current_user.id}'], private=True)
 def get_notifications():
-    """Get user notifications"""
-    # Simulate notifications based on user activity
-    notifications = []
-    
-    if current_user.is_freelancer:
-        pending_orders = Order.query.filter_by(freelancer_id=current_user.id, status='pending').count()
-        if pending_orders > 0:
-            notifications.append({
-                'type': 'order',
-                'message': f'You have {pending_orders} pending order(s)',
-                'timestamp': datetime.utcnow().isoformat()
-            })
-    
-    recent_orders = Order.query.filter(
-        Order.client_id == current_user.id,
-        Order.created_at >= datetime.utcnow() - timedelta(days=1)
-    ).count()
-    
-    if recent_orders > 0:
-        notifications.append({
-            'type': 'activity',
-            'message': f'You placed {recent_orders} order(s) recently',
-            'timestamp': datetime.utcnow().isoformat()
-        })
+    """Get user notifications
+    
+    Notifications are pushed over Socket.IO as they happen; this endpoint is
+    only for catching up after a (re)connect.  ?since=<seq> returns the
+    notifications after that sequence number, oldest first.  Without it the
+    most recent ones are returned, newest first.
+    """
+    since = request.args.get('since', type=int)
+    query = Notification.query.filter_by(user_id=current_user.id)
     
-    return jsonify(notifications)
+    if since is not None:
+        notifications = query.filter(Notification.seq > since).order_by(Notification.seq).limit(51).all()
+        has_more = len(notifications) > 50
+        notifications = notifications[:50]
+    else:
+        notifications = query.order_by(Notification.seq.desc()).limit(20).all()
+        has_more = False
+    
+    last_seq = max([n.seq for n in notifications] + [since or 0])
+    return jsonify({
+        'notifications': [notification.to_dict() for notification in notifications],
+        'last_seq': last_seq,
+        'has_more': has_more
+    })
 
 # Real-time Socket.IO events
+# Connected sockets per user, so emits can skip users who are offline
+presence = PresenceRegistry()
+
+def open_order_ids(user_id):
+    """Ids of the orders a user takes part in that are still in progress"""
+    rows = db.session.query(Order.id).filter(
+        db.or_(Order.client_id == user_id, Order.freelancer_id == user_id),
+        Order.status.notin_(['completed', 'cancelled'])
+    )
+    return [order_id for (order_id,) in rows]
+
+def join_order_room(order):
+    """Add every connected socket of an order's client and freelancer to its room"""
+    room = f"order_{order.id}"
+    for user_id in (order.client_id, order.freelancer_id):
+        for sid in presence.sids(user_id):
+            socketio.server.enter_room(sid, room, namespace='/')
+
 @socketio.on('connect')
 def handle_connect():
     if current_user.is_authenticated:
+        presence.connect(request.sid, current_user.id)
+        join_room(f"user_{current_user.id}")
+        for order_id in open_order_ids(current_user.id):
+            join_room(f"order_{order_id}")
         emit('user_connected', {'user_id': current_user.id})
 
+@socketio.on('disconnect')
+def handle_disconnect():
+    presence.disconnect(request.sid)
+
 @socketio.on('join_room')
 def handle_join_room(data):
     if current_user.is_authenticated:
         room = f"user_{current_user.id}"
+        join_room(room)
         emit('room_joined', {'room': room})
 
-def send_notification(user_id, message, notification_type='info'):
-    """Send real-time notification to user"""
+@socketio.on('join_order')
+def handle_join_order(data):
+    """Join the chat room of a finished order, which is not joined on connect"""
+    order = db.session.get(Order, data.get('order_id') or 0)
+    if current_user.is_authenticated and order and current_user.id in [order.client_id, order.freelancer_id]:
+        room = f"order_{order.id}"
+        join_room(room)
+        emit('room_joined', {'room': room})
+
+def store_notification(user_id, message, notification_type='info'):
+    """Persist a notification under the user's next sequence number
+
+    The number comes from the user's counter row, bumped in the same
+    transaction as the insert, so concurrent notifications never collide.
+    """
+    table = NotificationSequence.__table__
+    seq = increment_counter(db.session.connection(), table.c.user_id, user_id, table.c.last_seq)
+    notification = Notification(user_id=user_id, seq=seq, type=notification_type, message=message)
+    db.session.add(notification)
+    db.session.commit()
+    return notification
+
+def emit_notifications(user_id, notifications):
+    """Push a batch of notification dicts to a user as one packet"""
     room = f"user_{user_id}"
-    socketio.emit('notification', {
-        'message': message,
-        'type': notification_type,
-        'timestamp': datetime.utcnow().isoformat()
-    }, room=room)
+    if len(notifications) == 1:
+        socketio.emit('notification', notifications[0], room=room)
+    else:
+        socketio.emit('notifications', {
+            'notifications': notifications,
+            'summary': summarize(notifications)
+        }, room=room)
+
+notification_dispatcher = NotificationDispatcher(
+    emit_notifications,
+    window=app.config['NOTIFY_WINDOW_MS'] / 1000.0,
+    min_interval=app.config['NOTIFY_MIN_INTERVAL_MS'] / 1000.0,
+    spawn=socketio.start_background_task,
+    sleep=socketio.sleep
+)
+atexit.register(notification_dispatcher.flush)
+
+def send_notification(user_id, message, notification_type='info'):
+    """Store a notification and queue it for pushing to the user
+
+    Called once the change it reports is committed, so a failure here is
+    logged rather than failing the request that made the change.
+    """
+    try:
+        notification = store_notification(user_id, message, notification_type)
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Could not store notification for user %s: %s', user_id, message)
+        return
+    if socket_manager is None and not presence.is_online(user_id):
+        # Nobody to push to; they catch up from /api/notifications on connect.
+        # (Presence is per process, so with a message queue we always emit.)
+        return
+    notification_dispatcher.submit(user_id, notification.to_dict())
+
+def admin_required(view):
+    """Limit a view to the users named in ADMIN_USERS"""
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if current_user.username not in app.config['ADMIN_USERS']:
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/cache/metrics')
+@admin_required
+def cache_metrics():
+    """Hit/miss counters of the anonymous page and template fragment caches"""
+    stats = response_cache.stats()
+    stats['fragments'] = dict(app.jinja_env.fragment_cache_counters, entries=len(app.jinja_env.fragment_cache))
+    return jsonify(stats)
+
+@app.route('/api/notifications/metrics')
+@admin_required
+def notification_metrics():
+    """Queue depth and dispatch latency of real-time notifications"""
+    return jsonify(notification_dispatcher.stats())
+
+@app.route('/api/chat/metrics')
+@admin_required
+def chat_metrics():
+    """Queue depth and flush failures of the chat write-behind buffer"""
+    return jsonify(chat_buffer.stats())
 
 # Enhanced order creation with notifications
 @app.route('/order/<int:service_id>', methods=['GET', 'POST'])
 @login_required
 def create_order(service_id):
-    service = Service.query.get_or_404(service_id)
+    service = Service.query.options(*loading('service_page')).filter_by(id=service_id).first_or_404()
     
     if request.method == 'POST':
         requirements = request.form['requirements']
@@ -369,6 +1529,7 @@ def create_order(service_id):
         )
         db.session.add(order)
         db.session.commit()
+        join_order_room(order)
         
         # Send real-time notification to freelancer
         send_notification(
@@ -383,43 +1544,183 @@ def create_order(service_id):
     return render_template('create_order.html', service=service)
 
 # Live chat functionality
+def last_chat_seq(order_id):
+    return db.session.query(ChatSequence.last_seq).filter_by(order_id=order_id).scalar() or 0
+
+def next_chat_seq(order_id):
+    """Take an order's next chat sequence number
+
+    The number goes out with the live event and the ack before the message
+    is written, and clients expect consecutive numbers, so each one is taken
+    from the counter row in a transaction of its own: one single-statement
+    commit per message, holding the row only for that statement.  The
+    messages themselves are still written in batches.
+    """
+    table = ChatSequence.__table__
+    with db.engine.begin() as connection:
+        return increment_counter(connection, table.c.order_id, order_id, table.c.last_seq)
+
+def write_chat_messages(messages):
+    """Insert a batch of buffered chat messages in one transaction
+
+    Errors other than constraint violations propagate, so chat_buffer
+    retries the batch.  A violation cannot go away on a retry, so the batch
+    is then written one message at a time, leaving out the messages that
+    are already stored or cannot be.
+    """
+    with app.app_context():
+        db.session.add_all([ChatMessage(**message) for message in messages])
+        try:
+            db.session.commit()
+            return
+        except IntegrityError:
+            db.session.rollback()
+        for message in messages:
+            db.session.add(ChatMessage(**message))
+            try:
+                db.session.commit()
+            except IntegrityError as error:
+                db.session.rollback()
+                app.logger.warning('Chat message %s of order %s not written: %s',
+                                   message['seq'], message['order_id'], error.orig)
+
+chat_buffer = WriteBehindBuffer(
+    write_chat_messages,
+    max_batch=app.config['CHAT_BATCH_SIZE'],
+    max_delay=app.config['CHAT_FLUSH_MS'] / 1000.0,
+    spawn=socketio.start_background_task,
+    sleep=socketio.sleep
+)
+atexit.register(chat_buffer.flush)
+# Last messages of each order room, replayed to clients that reconnect
+recent_chat = RecentMessages(capacity=100)
+
+# Most messages a reconnecting client is sent per order in one go
+CHAT_REPLAY_LIMIT = 200
+
 @app.route('/api/chat/<int:order_id>')
 @login_required
 def get_chat_messages(order_id):
-    """Get chat messages for an order"""
+    """Get a page of chat messages for an order, oldest first"""
     order = Order.query.get_or_404(order_id)
     
     # Check if user is part of this order
     if current_user.id not in [order.client_id, order.freelancer_id]:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # For now, return empty messages (you can add a ChatMessage model later)
-    return jsonify({'messages': []})
+    before = request.args.get('before', type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+    if before is None:
+        # The newest page should include messages still waiting to be written
+        chat_buffer.flush()
+    
+    query = ChatMessage.query.options(db.joinedload(ChatMessage.sender)).filter_by(order_id=order.id)
+    if before is not None:
+        query = query.filter(ChatMessage.seq < before)
+    messages = query.order_by(ChatMessage.seq.desc()).limit(limit + 1).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit][::-1]
+    
+    return jsonify({
+        'messages': [message.to_dict() for message in messages],
+        'has_more': has_more,
+        'before': messages[0].seq if has_more else None
+    })
 
 @socketio.on('send_message')
 def handle_message(data):
-    """Handle real-time chat messages"""
+    """Relay a chat message to the order room and queue it for storage
+
+    The return value is the acknowledgement: the message's sequence number,
+    or an error.  A client resending a message it never got an ack for uses
+    the same client_id, and gets the original sequence number back.
+    """
     order_id = data.get('order_id')
-    message = data.get('message')
-    
-    if current_user.is_authenticated and order_id and message:
-        # Emit message to both client and freelancer
-        order = Order.query.get(order_id)
-        if order and current_user.id in [order.client_id, order.freelancer_id]:
-            room = f"order_{order_id}"
-            socketio.emit('new_message', {
-                'user_id': current_user.id,
-                'username': current_user.username,
-                'message': message,
-                'timestamp': datetime.utcnow().isoformat()
-            }, room=room)
+    message = (data.get('message') or '').strip()
+    client_id = data.get('client_id')
+    
+    if not (current_user.is_authenticated and order_id and message):
+        return {'error': 'Invalid message'}
+    order = db.session.get(Order, order_id)
+    if not order or current_user.id not in [order.client_id, order.freelancer_id]:
+        return {'error': 'Unauthorized'}
+    
+    if client_id:
+        duplicate = recent_chat.find(order.id, lambda sent: sent['client_id'] == client_id
+                                     and sent['user_id'] == current_user.id)
+        if duplicate:
+            return {'seq': duplicate['seq'], 'client_id': client_id}
+    
+    record = {
+        'order_id': order.id,
+        'seq': next_chat_seq(order.id),
+        'user_id': current_user.id,
+        'message': message,
+        'created_at': datetime.utcnow()
+    }
+    chat_buffer.add(record)
+    payload = {
+        'order_id': order.id,
+        'seq': record['seq'],
+        'user_id': current_user.id,
+        'username': current_user.username,
+        'message': message,
+        'timestamp': record['created_at'].isoformat(),
+        'client_id': client_id
+    }
+    recent_chat.add(order.id, payload)
+    # Emit message to both client and freelancer
+    socketio.emit('new_message', payload, room=f"order_{order.id}")
+    return {'seq': record['seq'], 'client_id': client_id}
+
+def missed_chat_messages(order_id, last_seq):
+    """Return (messages after last_seq, has_more), from memory when possible"""
+    messages = recent_chat.since(order_id, last_seq, last_chat_seq(order_id))
+    if messages is not None and len(messages) <= CHAT_REPLAY_LIMIT:
+        return messages, False
+    chat_buffer.flush()
+    rows = ChatMessage.query.options(db.joinedload(ChatMessage.sender)).filter(
+        ChatMessage.order_id == order_id, ChatMessage.seq > last_seq
+    ).order_by(ChatMessage.seq).limit(CHAT_REPLAY_LIMIT + 1).all()
+    return [row.to_dict() for row in rows[:CHAT_REPLAY_LIMIT]], len(rows) > CHAT_REPLAY_LIMIT
+
+@socketio.on('resume_chat')
+def handle_resume_chat(data):
+    """Replay the chat messages a reconnecting client missed
+
+    data['orders'] maps order ids to the last sequence number the client
+    has; each order's gap is sent back as one chat_replay event.  Its
+    last_seq is the number the client has everything up to afterwards: a
+    number that was handed out but never stored (a worker stopped with it
+    buffered) is skipped over rather than asked for again and again.
+    """
+    if not current_user.is_authenticated:
+        return
+    last_seen = {}
+    for order_id, seq in (data.get('orders') or {}).items():
+        try:
+            last_seen[int(order_id)] = max(int(seq or 0), 0)
+        except (TypeError, ValueError):
+            continue
+    if not last_seen:
+        return
+    
+    orders = Order.query.filter(
+        Order.id.in_(list(last_seen)),
+        db.or_(Order.client_id == current_user.id, Order.freelancer_id == current_user.id)
+    ).all()
+    for order in orders:
+        join_room(f"order_{order.id}")
+        messages, has_more = missed_chat_messages(order.id, last_seen[order.id])
+        emit('chat_replay', {'order_id': order.id, 'messages': messages, 'has_more': has_more,
+                             'last_seq': messages[-1]['seq'] if messages else last_seen[order.id]})
 
 # Payment System Routes
 @app.route('/payment/<int:order_id>', methods=['GET', 'POST'])
 @login_required
 def payment_page(order_id):
     """Payment page for completing order payment"""
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.options(*loading('order_rows')).filter_by(id=order_id).first_or_404()
     
     # Check if user is the client for this order
     if order.client_id != current_user.id:
@@ -489,7 +1790,7 @@ def payment_page(order_id):
 @login_required
 def payment_success(order_id):
     """Payment success page"""
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.options(*loading('order_rows')).filter_by(id=order_id).first_or_404()
     payment = Payment.query.filter_by(order_id=order_id).first()
     
     if not payment or payment.status != 'completed':
@@ -500,5 +1801,7 @@ def payment_success(order_id):
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        upgrade_database()
+        print('Database engine: ' + ', '.join(engine_settings()))
+        load_indexes()
     socketio.run(app, debug=True) 
\ No newline at end of file
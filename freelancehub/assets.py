@@ -0,0 +1,141 @@
+"""
+Fingerprinted, precompressed static assets.
+
+`flask build-assets` copies every script and stylesheet under static/ to a
+name carrying a hash of its contents (js/dynamic.3f2a9c1b7e.js), writes
+gzip and - when the brotli package is installed - brotli versions next to
+it, and records the mapping in static/assets-manifest.json.
+
+At runtime url_for('static', filename='js/dynamic.js') resolves to the
+fingerprinted name, and fingerprinted files are served precompressed
+according to Accept-Encoding with far-future immutable caching: a changed
+file gets a new name, so a cached copy never needs revalidating.
+"""
+
+import glob
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli variants are optional
+    brotli = None
+
+MANIFEST_NAME = 'assets-manifest.json'
+ASSET_PATTERNS = ('js/*.js', 'css/*.css')
+HASH_LENGTH = 10
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# (encoding, file suffix) in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def fingerprinted_name(filename, digest):
+    root, ext = os.path.splitext(filename)
+    return '%s.%s%s' % (root, digest[:HASH_LENGTH], ext)
+
+
+def is_fingerprinted(filename):
+    """True for names this module produced, e.g. js/dynamic.3f2a9c1b7e.js"""
+    root = os.path.splitext(filename)[0]
+    stem, _, digest = root.rpartition('.')
+    return bool(stem) and len(digest) == HASH_LENGTH and all(c in '0123456789abcdef' for c in digest)
+
+
+def build_assets(static_folder, patterns=ASSET_PATTERNS):
+    """Fingerprint and precompress the assets; returns the manifest written"""
+    manifest = {}
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(static_folder, pattern))):
+            filename = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            if is_fingerprinted(filename):
+                continue
+            with open(path, 'rb') as source:
+                content = source.read()
+            target = fingerprinted_name(filename, hashlib.sha256(content).hexdigest())
+            target_path = os.path.join(static_folder, target)
+
+            _remove_stale(static_folder, filename, target)
+            with open(target_path, 'wb') as output:
+                output.write(content)
+            with open(target_path + '.gz', 'wb') as output:
+                # mtime=0 keeps the output identical between builds
+                with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=9, mtime=0) as compressed:
+                    compressed.write(content)
+            if brotli is not None:
+                with open(target_path + '.br', 'wb') as output:
+                    output.write(brotli.compress(content, quality=11))
+            manifest[filename] = target
+
+    with open(os.path.join(static_folder, MANIFEST_NAME), 'w') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    return manifest
+
+
+def _remove_stale(static_folder, filename, keep):
+    """Delete earlier builds of an asset"""
+    root, ext = os.path.splitext(filename)
+    for path in glob.glob(os.path.join(static_folder, root + '.*' + ext + '*')):
+        name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+        base = name[:-3] if name.endswith(('.gz', '.br')) else name
+        if base != keep and is_fingerprinted(base):
+            os.remove(path)
+
+
+def load_manifest(static_folder):
+    """Return {source name: fingerprinted name}, empty before the first build"""
+    try:
+        with open(os.path.join(static_folder, MANIFEST_NAME)) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return {}
+
+
+class AssetPipeline:
+    """Serves fingerprinted assets for a Flask app"""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.fingerprinted = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.reload()
+        app.url_defaults(self.rewrite_static_url)
+        app.view_functions['static'] = self.send_static
+
+    def reload(self):
+        self.manifest = load_manifest(self.app.static_folder)
+        self.fingerprinted = set(self.manifest.values())
+
+    def rewrite_static_url(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+
+    def send_static(self, filename):
+        """Serve a static file, precompressed and immutable when fingerprinted"""
+        if filename not in self.fingerprinted:
+            return self.app.send_static_file(filename)
+
+        folder = self.app.static_folder
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = request.accept_encodings
+        for encoding, suffix in ENCODINGS:
+            if accepted[encoding] and os.path.exists(os.path.join(folder, filename + suffix)):
+                response = send_from_directory(folder, filename + suffix, mimetype=mimetype,
+                                               max_age=IMMUTABLE_MAX_AGE)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(folder, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
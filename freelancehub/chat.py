@@ -0,0 +1,166 @@
+"""
+Write-behind storage for order chat.
+
+Chat messages are relayed to the order room as soon as they arrive, but
+they are written to the database in batches: a batch is flushed once it
+holds max_batch messages or max_delay seconds after its first message,
+whichever comes first, so a busy room costs one commit per batch instead
+of one per message.  The sender is acknowledged once the message is
+queued, so a batch that fails to write is never dropped: it goes back to
+the front of the queue and is retried, with a growing delay, until it is
+written.
+
+Each message takes its order's next sequence number from a counter row
+in the database when it is received (app.next_chat_seq), before the
+message itself is written, so the number can go out with the live event
+and clients can page and resume by it.  The last messages of every room
+are also kept in memory, so a client that reconnects after a short drop
+gets just the messages it missed without a database query.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from operator import itemgetter
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Collects items and hands them to write(items) in batches
+
+    spawn(fn) starts fn in the background and sleep(seconds) pauses it; they
+    default to threads and time.sleep, and can be swapped for the Socket.IO
+    server's own so the flusher fits whatever async mode it runs in.
+
+    When write raises, the batch is queued again and retried after
+    retry_delay seconds, doubling with each failure in a row up to
+    max_retry_delay.
+    """
+
+    def __init__(self, write, max_batch=50, max_delay=0.25, spawn=None, sleep=time.sleep,
+                 retry_delay=1.0, max_retry_delay=30.0):
+        self.write = write
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.spawn = spawn or self._spawn_thread
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = []
+        self.scheduled = False
+        self.failures_in_row = 0
+        self.metrics = Counter()
+
+    @staticmethod
+    def _spawn_thread(fn):
+        thread = threading.Thread(target=fn, daemon=True)
+        thread.start()
+        return thread
+
+    def add(self, item):
+        """Queue an item; flushes straight away once the batch is full"""
+        with self.lock:
+            self.pending.append(item)
+            full = len(self.pending) >= self.max_batch
+            schedule = not full and not self.scheduled
+            if schedule:
+                self.scheduled = True
+        if full:
+            self.flush()
+        elif schedule:
+            self.spawn(self._flush_later)
+
+    def _flush_later(self, delay=None):
+        self.sleep(self.max_delay if delay is None else delay)
+        self.flush()
+
+    def flush(self):
+        """Write everything queued so far; returns whether it was written"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+                self.scheduled = False
+            if not batch:
+                return True
+            try:
+                self.write(batch)
+            except Exception:
+                with self.lock:
+                    # Ahead of anything queued meanwhile, to keep the order
+                    self.pending[:0] = batch
+                    self.failures_in_row += 1
+                    self.metrics['failed_flushes'] += 1
+                    delay = min(self.retry_delay * 2 ** (self.failures_in_row - 1), self.max_retry_delay)
+                    schedule = not self.scheduled
+                    self.scheduled = True
+                logger.exception('Writing %d buffered items failed (%d failures in a row), retrying in %.1fs',
+                                 len(batch), self.failures_in_row, delay)
+                if schedule:
+                    self.spawn(lambda: self._flush_later(delay))
+                return False
+            with self.lock:
+                self.failures_in_row = 0
+                self.metrics['flushes'] += 1
+                self.metrics['written'] += len(batch)
+            return True
+
+    def stats(self):
+        """Queue depth and flush counters"""
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'flushes': self.metrics['flushes'],
+                'written': self.metrics['written'],
+                'failed_flushes': self.metrics['failed_flushes'],
+                'failures_in_row': self.failures_in_row,
+            }
+
+
+class RecentMessages:
+    """Ring buffer of the last messages of each room, for reconnect replay
+
+    Holds up to `capacity` messages (dicts with a 'seq') for each of the
+    `max_rooms` most recently active rooms.
+    """
+
+    def __init__(self, capacity=100, max_rooms=1000):
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        self.lock = threading.Lock()
+        self.rooms = OrderedDict()  # room -> deque of messages, least recently active first
+
+    def add(self, room, message):
+        with self.lock:
+            messages = self.rooms.get(room)
+            if messages is None:
+                messages = self.rooms[room] = deque(maxlen=self.capacity)
+                if len(self.rooms) > self.max_rooms:
+                    self.rooms.popitem(last=False)
+            else:
+                self.rooms.move_to_end(room)
+            messages.append(message)
+
+    def since(self, room, seq, latest):
+        """Return the messages after seq up to latest, or None if any are not held"""
+        if latest <= seq:
+            return []
+        with self.lock:
+            newer = sorted((message for message in self.rooms.get(room, ()) if message['seq'] > seq),
+                           key=itemgetter('seq'))
+        # Only a complete run seq+1 .. latest will do; anything less means the
+        # gap reaches past the buffer (or includes messages from another worker)
+        if len(newer) == latest - seq and newer[0]['seq'] == seq + 1 and newer[-1]['seq'] == latest:
+            return newer
+        return None
+
+    def find(self, room, predicate):
+        """Return the most recent message of a room matching predicate, or None"""
+        with self.lock:
+            for message in reversed(self.rooms.get(room, ())):
+                if predicate(message):
+                    return message
+        return None
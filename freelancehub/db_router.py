@@ -0,0 +1,149 @@
+"""
+Read/write splitting across a primary database and read replicas.
+
+Views marked @read_replica send their queries to one of the replicas in
+SQLALCHEMY_REPLICA_URIS; everything else - every write, every flush, and
+any view not marked - uses the primary.  A replica can lag the primary by
+up to REPLICA_LAG_SECONDS, so reads go back to the primary when:
+
+    the browser wrote something within the lag (read-your-writes: the
+    session cookie carries the deadline, so it holds across workers)
+
+    recently_changed(lag) says the data the page shows changed within the
+    lag - a page rendered from a stale replica must not be cached or
+    given an ETag under the new version
+
+    the code asked for the primary with router.primary(), as the
+    in-memory indexes do: a stale replica would leave them permanently
+    behind
+
+Locally a replica can be an SQLite file refreshed with `flask sync-replica`
+(see copy_sqlite_database).  SQLite replicas are opened without pooling so
+each request sees the latest copy.
+"""
+
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql.dml import UpdateBase
+
+# Session cookie key: reads go to the primary until this time
+STICKY_KEY = '_primary_until'
+
+
+def read_replica(view):
+    """Let a read-only view's queries go to a replica"""
+    view.read_replica = True
+    return view
+
+
+class RoutingSession(Session):
+    """db.session that sends the reads of replica-routed requests to a replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not _is_write(clause):
+            router = current_app.extensions.get('replica_router')
+            replica = router.replica() if router is not None else None
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_write(clause):
+    return isinstance(clause, UpdateBase) or getattr(clause, '_for_update_arg', None) is not None
+
+
+class ReplicaRouter:
+    """Chooses between the primary and the replicas for each request"""
+
+    def __init__(self, app=None, db=None, engine_options=None, recently_changed=None):
+        self.engines = []
+        self.recently_changed = recently_changed
+        if app is not None:
+            self.init_app(app, db, engine_options)
+
+    def init_app(self, app, db, engine_options=None):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_LAG_SECONDS', 10)
+        self.lag = app.config['REPLICA_LAG_SECONDS']
+        self.engines = [create_replica_engine(app, uri, engine_options or {})
+                        for uri in app.config['SQLALCHEMY_REPLICA_URIS']]
+        app.extensions['replica_router'] = self
+        if not self.engines:
+            return
+        event.listen(db.session, 'after_flush', self.note_write)
+
+        @app.after_request
+        def stick_to_primary(response):
+            # Read this browser's writes from the primary until the replicas have them
+            if g.get('db_wrote'):
+                session[STICKY_KEY] = time.time() + self.lag
+            return response
+
+    def note_write(self, db_session, flush_context):
+        if has_request_context():
+            g.db_wrote = True
+
+    def replica(self):
+        """The engine for the current request's reads, None meaning the primary"""
+        if not self.engines or not has_request_context() or g.get('primary_reads'):
+            return None
+        if not getattr(current_app.view_functions.get(request.endpoint), 'read_replica', False):
+            return None
+        if session.get(STICKY_KEY, 0) > time.time():
+            return None
+        if self.recently_changed is not None and self.recently_changed(self.lag):
+            return None
+        if 'replica_engine' not in g:
+            g.replica_engine = random.choice(self.engines)
+        return g.replica_engine
+
+    @contextmanager
+    def primary(self):
+        """Send the reads inside the block to the primary"""
+        previous = g.get('primary_reads', False)
+        g.primary_reads = True
+        try:
+            yield
+        finally:
+            g.primary_reads = previous
+
+
+def create_replica_engine(app, uri, engine_options):
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite':
+        return sa.create_engine(url, **engine_options)
+    # Relative paths are in the instance folder, as Flask-SQLAlchemy does for the primary
+    if url.database and url.database != ':memory:' and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(app.instance_path, url.database))
+    return sa.create_engine(url, poolclass=NullPool)
+
+
+def copy_sqlite_database(source, target):
+    """Replace target with a consistent snapshot of the SQLite database at source
+
+    The snapshot is written next to target and moved into place, so readers
+    see either the old copy or the new one, never a half-written file.
+    """
+    temporary = target + '.tmp'
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(temporary)
+    try:
+        source_connection.backup(target_connection)
+        # A replica is only read; rollback journaling leaves no -wal file to go stale
+        target_connection.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target_connection.close()
+        source_connection.close()
+    os.replace(temporary, target)
@@ -0,0 +1,92 @@
+"""
+Named database engine profiles.
+
+DB_PROFILE picks one; "auto" (the default) takes the tuned profile for the
+database in SQLALCHEMY_DATABASE_URI:
+
+    sqlite-wal        WAL journaling, so readers no longer wait behind a
+                      writer; synchronous=NORMAL (durable at checkpoints
+                      rather than every commit, still crash-safe in WAL);
+                      memory-mapped reads, a larger page cache and a busy
+                      timeout instead of immediate "database is locked"
+    postgres-pooled   a bounded connection pool per process, recycled
+                      connections and a liveness check on checkout, so a
+                      server-side disconnect costs a retry, not a 500
+    default           SQLAlchemy's defaults, nothing changed
+
+report() returns the settings as the database actually applied them: an
+SQLite file on a filesystem without shared memory support, for one, stays
+in rollback journaling whatever the profile asks for.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+class EngineProfile:
+    """Engine options and per-connection settings for one kind of database"""
+
+    def __init__(self, name, dialect=None, engine_options=None, pragmas=None):
+        self.name = name
+        self.dialect = dialect
+        self.engine_options = engine_options or {}
+        self.pragmas = pragmas or {}  # SQLite only, applied in order on connect
+
+    def install(self, engine):
+        """Apply the per-connection settings to every new connection"""
+        if self.pragmas and not event.contains(engine, 'connect', self.set_pragmas):
+            event.listen(engine, 'connect', self.set_pragmas)
+
+    def set_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in self.pragmas.items():
+            cursor.execute('PRAGMA %s = %s' % (pragma, value))
+        cursor.close()
+
+    def report(self, engine):
+        """Return [(setting, effective value)] for a startup log"""
+        settings = [('profile', self.name), ('database', engine.url.render_as_string(hide_password=True)),
+                    ('pool', type(engine.pool).__name__)]
+        for option, value in sorted(self.engine_options.items()):
+            settings.append((option, value))
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as connection:
+                for pragma in self.pragmas or ('journal_mode', 'synchronous'):
+                    value = connection.exec_driver_sql('PRAGMA %s' % pragma).scalar()
+                    settings.append((pragma, value))
+        return settings
+
+
+PROFILES = {
+    'default': EngineProfile('default'),
+    'sqlite-wal': EngineProfile('sqlite-wal', dialect='sqlite', pragmas={
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,  # bytes
+        'cache_size': -64 * 1024,  # negative: KiB, so 64 MiB
+        'busy_timeout': 5000,  # ms
+    }),
+    'postgres-pooled': EngineProfile('postgres-pooled', dialect='postgresql', engine_options={
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,  # below typical idle-connection timeouts
+        'pool_pre_ping': True,
+    }),
+}
+
+# What "auto" picks for each dialect
+AUTO_PROFILES = {'sqlite': 'sqlite-wal', 'postgresql': 'postgres-pooled'}
+
+
+def select_profile(name, database_uri):
+    """Return the profile called name, or the one "auto" picks for the URI"""
+    dialect = make_url(database_uri).get_backend_name()
+    if name == 'auto':
+        name = AUTO_PROFILES.get(dialect, 'default')
+    if name not in PROFILES:
+        raise ValueError('Unknown DB_PROFILE %r, expected auto or one of: %s' % (name, ', '.join(sorted(PROFILES))))
+    profile = PROFILES[name]
+    if profile.dialect and profile.dialect != dialect:
+        raise ValueError('DB_PROFILE %r is for %s, but the database is %s' % (name, profile.dialect, dialect))
+    return profile
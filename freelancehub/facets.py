@@ -0,0 +1,120 @@
+"""
+Facet counts for the service catalogue filters.
+
+The index keeps, for every active service, the facet values it falls under
+(category, price band and delivery-time band) together with running totals
+per value.  Totals are adjusted as services are created or deactivated, and
+counts for any result set are a single pass over its ids - no GROUP BY.
+"""
+
+import threading
+from collections import Counter
+
+# (label, upper bound) pairs; a value falls in the first band it is below
+PRICE_BANDS = [
+    ('Under $50', 50),
+    ('$50 - $100', 100),
+    ('$100 - $250', 250),
+    ('$250 - $500', 500),
+    ('$500 & up', None),
+]
+
+DELIVERY_BANDS = [
+    ('1 day', 2),
+    ('Up to 3 days', 4),
+    ('Up to 7 days', 8),
+    ('Up to 14 days', 15),
+    ('Over 2 weeks', None),
+]
+
+FACETS = ('category', 'price', 'delivery_time')
+
+
+def band_for(value, bands):
+    """Return the label of the band value falls in"""
+    for label, upper in bands:
+        if upper is None or (value or 0) < upper:
+            return label
+
+
+def facet_values(doc):
+    """Return the (category, price band, delivery band) of a service document"""
+    return (
+        doc.get('category'),
+        band_for(doc.get('price'), PRICE_BANDS),
+        band_for(doc.get('delivery_time'), DELIVERY_BANDS),
+    )
+
+
+class FacetIndex:
+    """Incrementally maintained facet counts over the active catalogue"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = False
+        self.values = {}                                 # service_id -> facet values
+        self.totals = {facet: Counter() for facet in FACETS}
+
+    def rebuild(self, docs):
+        """Recount the facets from the given service documents"""
+        with self.lock:
+            self.values = {}
+            self.totals = {facet: Counter() for facet in FACETS}
+            for doc in docs:
+                self._add(doc)
+            self.built = True
+
+    def add(self, doc):
+        """Count (or recount) a single service"""
+        with self.lock:
+            self._remove(doc['id'])
+            self._add(doc)
+
+    def remove(self, service_id):
+        """Stop counting a service"""
+        with self.lock:
+            self._remove(service_id)
+
+    def _add(self, doc):
+        values = facet_values(doc)
+        self.values[doc['id']] = values
+        for facet, value in zip(FACETS, values):
+            self.totals[facet][value] += 1
+
+    def _remove(self, service_id):
+        values = self.values.pop(service_id, None)
+        if values is None:
+            return
+        for facet, value in zip(FACETS, values):
+            self.totals[facet][value] -= 1
+            if self.totals[facet][value] <= 0:
+                del self.totals[facet][value]
+
+    def counts(self, service_ids=None):
+        """Return {facet: {value: count}} for the whole catalogue or the given ids"""
+        with self.lock:
+            if service_ids is None:
+                return {facet: dict(totals) for facet, totals in self.totals.items()}
+            counts = {facet: Counter() for facet in FACETS}
+            for service_id in service_ids:
+                values = self.values.get(service_id)
+                if values is None:
+                    continue
+                for facet, value in zip(FACETS, values):
+                    counts[facet][value] += 1
+            return {facet: dict(totals) for facet, totals in counts.items()}
+
+    def category_of(self, service_id):
+        """Return the category of an active service, or None"""
+        values = self.values.get(service_id)
+        return values[0] if values else None
+
+    def filter(self, service_ids, category=None):
+        """Keep the ids (in order) of services in the given category"""
+        if not category:
+            return list(service_ids)
+        with self.lock:
+            return [
+                service_id for service_id in service_ids
+                if service_id in self.values and self.values[service_id][0] == category
+            ]
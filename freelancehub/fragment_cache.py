@@ -0,0 +1,50 @@
+"""
+Jinja extension caching rendered template fragments.
+
+    {% cache 'service-card', service.id, service.version %}
+        ... markup ...
+    {% endcache %}
+
+The fragment is rendered once per distinct key - the name plus every value
+after it - and served from a bounded LRU afterwards.  Anything the markup
+depends on belongs in the key; a key that includes an entity's version
+picks up changes by itself, and the superseded fragments age out.
+"""
+
+from collections import Counter
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from response_cache import MemoryBackend
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(
+            fragment_cache=MemoryBackend(max_entries=2048),
+            fragment_cache_counters=Counter()
+        )
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        key = repr(tuple(key))
+        cache = self.environment.fragment_cache
+        fragment = cache.get(key)
+        if fragment is None:
+            self.environment.fragment_cache_counters['misses'] += 1
+            fragment = caller()
+            cache.set(key, fragment, ())
+        else:
+            self.environment.fragment_cache_counters['hits'] += 1
+        return fragment
@@ -0,0 +1,143 @@
+"""
+Typo-tolerant matching for catalogue search.
+
+Words from service titles and freelancer skills are indexed by their
+character trigrams.  To correct a misspelled word we only look at words
+sharing enough trigrams with it to possibly be within the allowed edit
+distance (an edit changes at most three trigrams), so the expensive
+edit-distance check runs on a handful of candidates instead of the whole
+vocabulary.
+"""
+
+import threading
+from collections import Counter
+
+from search import tokenize
+
+# Maximum number of candidates that get a full edit-distance check
+MAX_CANDIDATES = 50
+
+# Words shorter than this are never corrected
+MIN_WORD_LENGTH = 3
+
+
+def trigrams(word):
+    """Return the set of padded character trigrams of a word"""
+    padded = '$%s$' % word
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(word):
+    """Edits allowed when correcting a word of this length"""
+    return 1 if len(word) <= 4 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Trigram index over the title and skill vocabulary of the catalogue"""
+
+    def __init__(self, max_candidates=MAX_CANDIDATES):
+        self.max_candidates = max_candidates
+        self.lock = threading.Lock()
+        self.built = False
+        self.trigram_words = {}       # trigram -> set of words
+        self.word_counts = Counter()  # word -> number of services using it
+        self.service_words = {}       # service_id -> set of words
+
+    def rebuild(self, docs):
+        """Replace the vocabulary with the words of the given services"""
+        with self.lock:
+            self.trigram_words = {}
+            self.word_counts = Counter()
+            self.service_words = {}
+            for doc in docs:
+                self._add(doc)
+            self.built = True
+
+    def add(self, doc):
+        """Add (or refresh) the words of a single service"""
+        with self.lock:
+            self._remove(doc['id'])
+            self._add(doc)
+
+    def remove(self, service_id):
+        """Forget the words of a service no longer in the catalogue"""
+        with self.lock:
+            self._remove(service_id)
+
+    def _add(self, doc):
+        words = {
+            word for word in tokenize(doc.get('title')) + tokenize(doc.get('skills'))
+            if len(word) >= MIN_WORD_LENGTH and not word.isdigit()
+        }
+        self.service_words[doc['id']] = words
+        for word in words:
+            if not self.word_counts[word]:
+                for gram in trigrams(word):
+                    self.trigram_words.setdefault(gram, set()).add(word)
+            self.word_counts[word] += 1
+
+    def _remove(self, service_id):
+        for word in self.service_words.pop(service_id, ()):
+            self.word_counts[word] -= 1
+            if self.word_counts[word] > 0:
+                continue
+            del self.word_counts[word]
+            for gram in trigrams(word):
+                words = self.trigram_words.get(gram)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self.trigram_words[gram]
+
+    def correct_word(self, word):
+        """Return the closest known word to word, or None if nothing is close"""
+        if len(word) < MIN_WORD_LENGTH or word in self.word_counts:
+            return None
+        limit = max_distance(word)
+        grams = trigrams(word)
+        required = max(1, len(grams) - 3 * limit)
+
+        shared = Counter()
+        for gram in grams:
+            for candidate in self.trigram_words.get(gram, ()):
+                if abs(len(candidate) - len(word)) <= limit:
+                    shared[candidate] += 1
+
+        best = None
+        for candidate, overlap in shared.most_common(self.max_candidates):
+            if overlap < required:
+                break
+            distance = edit_distance(word, candidate, limit)
+            if distance <= limit:
+                rank = (distance, -self.word_counts[candidate], candidate)
+                if best is None or rank < best:
+                    best = rank
+        return best[2] if best else None
+
+    def suggest(self, query):
+        """Return query with misspelled words corrected, or None if unchanged"""
+        words = tokenize(query)
+        with self.lock:
+            corrected = [self.correct_word(word) or word for word in words]
+        if corrected == words:
+            return None
+        return ' '.join(corrected)
@@ -0,0 +1,78 @@
+"""
+Cached user identities for Flask-Login.
+
+Most requests and Socket.IO events only look at current_user.id, username
+or is_freelancer.  The user loader serves those from a small TTL cache
+instead of the database; any other attribute loads the full User row on
+first use, once per request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+# The columns served from the cache
+IDENTITY_FIELDS = ('id', 'username', 'is_freelancer')
+
+
+class UserIdentity(UserMixin):
+    """Stand-in for current_user that loads the full row only when needed
+
+    load_user(id) returns the User row, used for anything beyond the
+    identity fields.
+    """
+
+    def __init__(self, fields, load_user):
+        self.id, self.username, self.is_freelancer = fields
+        self._load_user = load_user
+        self._user = None
+
+    @property
+    def user(self):
+        """The full User row"""
+        if self._user is None:
+            self._user = self._load_user(self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('_user', '_load_user'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __repr__(self):
+        return '<UserIdentity %r>' % self.username
+
+
+class IdentityCache:
+    """Identity fields of up to max_entries users, each kept for ttl seconds"""
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # user_id -> (expires at, fields), least recently used first
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, fields):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl, fields)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_ids):
+        with self.lock:
+            for user_id in user_ids:
+                self.entries.pop(user_id, None)
@@ -0,0 +1,149 @@
+"""
+Message-queue backends for running Socket.IO across several worker processes.
+
+Each worker only knows the sockets connected to it, so an emit has to go
+through a shared queue to reach sockets held by other workers.  The backend
+is picked from the SOCKETIO_MESSAGE_QUEUE setting:
+
+    (unset)                     single process, no queue
+    redis://host:6379/0         Redis pub/sub (production)
+    amqp://... and other kombu  RabbitMQ and friends via kombu
+    sqlite:///socketio_queue.db SQLite file shared by the workers on one host,
+                                for local multi-worker runs and tests
+
+The same queue also carries application events between workers (see
+AppEventMixin) so their in-memory indexes stay in step.
+"""
+
+import json
+import pickle
+import sqlite3
+import threading
+import time
+
+import socketio
+
+
+class AppEventMixin:
+    """Lets workers broadcast application events over the Socket.IO queue
+
+    Messages published with publish_app_event() are picked out of the
+    listening stream and passed to on_app_event(name, payload) on every
+    other worker; everything else flows on to the Socket.IO handlers.
+    """
+
+    on_app_event = None
+
+    def start(self):
+        """Start listening now instead of on the first client connection"""
+        if not self.server.manager_initialized:
+            self.server.manager_initialized = True
+            self.initialize()
+
+    def publish_app_event(self, name, payload):
+        self._publish({'method': 'app_event', 'name': name, 'payload': payload,
+                       'host_id': self.host_id})
+
+    def _listen(self):
+        for message in super()._listen():
+            data = message
+            if isinstance(message, bytes):
+                try:
+                    data = pickle.loads(message)
+                except Exception:
+                    try:
+                        data = json.loads(message)
+                    except Exception:
+                        data = None
+            if isinstance(data, dict) and data.get('method') == 'app_event':
+                if data.get('host_id') != self.host_id and self.on_app_event is not None:
+                    try:
+                        self.on_app_event(data['name'], data['payload'])
+                    except Exception:
+                        self._get_logger().exception('Error handling app event %s', data.get('name'))
+                continue
+            yield message
+
+
+class SQLiteManager(socketio.PubSubManager):
+    """Socket.IO client manager backed by a table in a shared SQLite file
+
+    Published messages are appended to the table; every worker polls it for
+    rows newer than the last one it has seen.  Rows older than `retention`
+    seconds are pruned.  Meant for workers on one host, not for production.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, url='sqlite:///socketio_queue.db', channel='socketio', write_only=False,
+                 logger=None, poll_interval=0.05, retention=60):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = url[len('sqlite:///'):] if url.startswith('sqlite:///') else url
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.conn = self._connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS socketio_queue ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, '
+            'payload BLOB NOT NULL, created REAL NOT NULL)'
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _publish(self, data):
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO socketio_queue (channel, payload, created) VALUES (?, ?, ?)',
+                (self.channel, pickle.dumps(data), time.time())
+            )
+
+    def _sleep(self, seconds):
+        if self.server is not None:
+            self.server.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _listen(self):
+        conn = self._connect()
+        last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM socketio_queue').fetchone()[0]
+        last_prune = time.time()
+        while True:
+            rows = conn.execute(
+                'SELECT id, payload FROM socketio_queue WHERE id > ? AND channel = ? ORDER BY id',
+                (last_id, self.channel)
+            ).fetchall()
+            for row_id, payload in rows:
+                last_id = row_id
+                yield bytes(payload)
+            if time.time() - last_prune > self.retention:
+                last_prune = time.time()
+                conn.execute('DELETE FROM socketio_queue WHERE created < ?', (last_prune - self.retention,))
+            if not rows:
+                self._sleep(self.poll_interval)
+
+
+class SQLiteQueueManager(AppEventMixin, SQLiteManager):
+    pass
+
+
+class RedisQueueManager(AppEventMixin, socketio.RedisManager):
+    pass
+
+
+class KombuQueueManager(AppEventMixin, socketio.KombuManager):
+    pass
+
+
+def make_client_manager(url, channel='freelancehub'):
+    """Build the Socket.IO client manager for a queue URL, or None for none"""
+    if not url:
+        return None
+    if url.startswith('sqlite:'):
+        return SQLiteQueueManager(url, channel=channel)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisQueueManager(url, channel=channel)
+    return KombuQueueManager(url, channel=channel)
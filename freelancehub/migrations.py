@@ -0,0 +1,131 @@
+"""
+Schema migrations.
+
+Each migration has a version, a description and a function taking the
+engine.  Applied versions are recorded in the schema_migrations table, so
+upgrade() only runs what a database has not seen yet.
+
+upgrade() runs once per deploy (`flask migrate`), not in every worker, and
+holds a lock while it works so that two instances starting together do
+not both create the same tables: an advisory lock on Postgres, an
+exclusive lock on a file next to the database on SQLite.
+
+Migrations must work on a database of any age - one created by an old
+db.create_all() as well as an empty one - so they check before they
+create.  Indexes on existing tables are built online where the database
+supports it: CREATE INDEX CONCURRENTLY on Postgres, which does not block
+writes.  (SQLite builds indexes under a short write lock either way.)
+"""
+
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+import sqlalchemy as sa
+
+try:
+    import fcntl
+except ImportError:  # Windows: no gunicorn there, so only one process migrates
+    fcntl = None
+
+schema_migrations = sa.Table(
+    'schema_migrations', sa.MetaData(),
+    sa.Column('version', sa.String(32), primary_key=True),
+    sa.Column('description', sa.String(200), nullable=False),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+# pg_advisory_lock key shared by every process migrating the same database
+ADVISORY_LOCK_KEY = zlib.crc32(b'schema_migrations')
+
+
+@contextmanager
+def migration_lock(engine):
+    """Hold the database's migration lock inside the block"""
+    if engine.dialect.name == 'postgresql':
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(sa.text('SELECT pg_advisory_lock(:key)'), {'key': ADVISORY_LOCK_KEY})
+            try:
+                yield
+            finally:
+                connection.execute(sa.text('SELECT pg_advisory_unlock(:key)'), {'key': ADVISORY_LOCK_KEY})
+        return
+    database = engine.url.database if engine.dialect.name == 'sqlite' else None
+    if fcntl is None or not database or database == ':memory:':
+        yield
+        return
+    with open(database + '.migrate-lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def create_index_online(engine, index):
+    """Create a declared index on an existing table unless it is there already"""
+    if engine.dialect.name == 'postgresql':
+        preparer = engine.dialect.identifier_preparer
+        columns = ', '.join(preparer.quote(column.name) for column in index.columns)
+        # CONCURRENTLY cannot run inside a transaction
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql('CREATE %sINDEX CONCURRENTLY IF NOT EXISTS %s ON %s (%s)' % (
+                'UNIQUE ' if index.unique else '', preparer.quote(index.name),
+                preparer.format_table(index.table), columns
+            ))
+    else:
+        with engine.begin() as connection:
+            index.create(connection, checkfirst=True)
+
+
+class Migrations:
+    """Ordered migrations for one SQLAlchemy MetaData"""
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.steps = []
+
+    def migration(self, version, description):
+        """Register a function(engine) as a migration"""
+        def decorator(fn):
+            self.steps.append((version, description, fn))
+            return fn
+        return decorator
+
+    def applied(self, engine):
+        """Return the set of versions already applied to a database"""
+        if not sa.inspect(engine).has_table(schema_migrations.name):
+            return set()
+        with engine.connect() as connection:
+            return {row.version for row in connection.execute(sa.select(schema_migrations.c.version))}
+
+    def pending(self, engine):
+        applied = self.applied(engine)
+        return [step for step in self.steps if step[0] not in applied]
+
+    def upgrade(self, engine, log=None):
+        """Apply every pending migration in order; returns the versions applied"""
+        done = []
+        with migration_lock(engine):
+            schema_migrations.create(engine, checkfirst=True)
+            # Read under the lock: another process may have just finished
+            for version, description, fn in self.pending(engine):
+                if log:
+                    log('Applying %s: %s' % (version, description))
+                fn(engine)
+                with engine.begin() as connection:
+                    connection.execute(schema_migrations.insert().values(
+                        version=version, description=description, applied_at=datetime.utcnow()
+                    ))
+                done.append(version)
+        return done
+
+    def indexes(self, *names):
+        """Look up declared indexes by name"""
+        wanted = set(names)
+        found = [index for table in self.metadata.sorted_tables for index in table.indexes
+                 if index.name in wanted]
+        missing = wanted - {index.name for index in found}
+        if missing:
+            raise KeyError('Undeclared indexes: %s' % ', '.join(sorted(missing)))
+        return found
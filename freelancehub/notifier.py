@@ -0,0 +1,126 @@
+"""
+Background dispatch of real-time notifications.
+
+Requests hand notifications to the dispatcher and return; the emits happen
+in the background.  Notifications for the same user that arrive close
+together are coalesced into a single packet, and each user gets at most one
+packet per min_interval seconds - whatever piles up in the meantime goes
+out together in the next one.  A user's packet goes out `window` seconds
+after their first pending notification, or once min_interval has passed
+since their previous packet, whichever is later.
+"""
+
+import threading
+import time
+from collections import Counter
+
+# How a group of notifications of one type is summed up, e.g. "3 new orders"
+TYPE_LABELS = {
+    'order': ('new order', 'new orders'),
+    'payment': ('payment received', 'payments received'),
+}
+
+
+def summarize(notifications):
+    """One-line summary of a batch of notification dicts"""
+    counts = Counter(notification.get('type') for notification in notifications)
+    parts = []
+    for notification_type, count in counts.most_common():
+        singular, plural = TYPE_LABELS.get(notification_type, ('notification', 'notifications'))
+        parts.append('%d %s' % (count, singular if count == 1 else plural))
+    return ', '.join(parts)
+
+
+class NotificationDispatcher:
+    """Queues notifications per user and emits them in coalesced batches
+
+    emit(user_id, notifications) sends one packet; spawn and sleep work as
+    for chat.WriteBehindBuffer.
+    """
+
+    def __init__(self, emit, window=0.5, min_interval=2.0, spawn=None, sleep=time.sleep):
+        self.emit = emit
+        self.window = window
+        self.min_interval = min_interval
+        self.spawn = spawn or self._spawn_thread
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.pending = {}    # user_id -> list of (queued at, notification)
+        self.last_sent = {}  # user_id -> time of the user's last packet
+        self.metrics = Counter()
+        self.max_latency = 0.0
+
+    @staticmethod
+    def _spawn_thread(fn, *args):
+        thread = threading.Thread(target=fn, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    def submit(self, user_id, notification):
+        """Queue a notification dict for a user"""
+        now = time.time()
+        with self.lock:
+            queue = self.pending.get(user_id)
+            first = queue is None
+            if first:
+                queue = self.pending[user_id] = []
+            queue.append((now, notification))
+            self.metrics['submitted'] += 1
+            if first:
+                due = max(now + self.window, self.last_sent.get(user_id, 0) + self.min_interval)
+        if first:
+            self.spawn(self._dispatch_later, user_id, due - now)
+
+    def _dispatch_later(self, user_id, delay):
+        if delay > 0:
+            self.sleep(delay)
+        self.dispatch(user_id)
+
+    def dispatch(self, user_id):
+        """Emit everything pending for a user as one packet"""
+        with self.lock:
+            queue = self.pending.pop(user_id, None)
+            if not queue:
+                return
+            now = time.time()
+            self.last_sent[user_id] = now
+        try:
+            self.emit(user_id, [notification for _, notification in queue])
+        except Exception:
+            with self.lock:
+                self.metrics['failed'] += len(queue)
+            raise
+        latency = time.time() - queue[0][0]
+        with self.lock:
+            self.metrics['packets'] += 1
+            self.metrics['dispatched'] += len(queue)
+            self.metrics['coalesced'] += len(queue) - 1
+            self.metrics['latency_total'] += latency
+            self.max_latency = max(self.max_latency, latency)
+            if len(self.last_sent) > 10000:
+                # Only recent sends matter for shaping
+                cutoff = now - self.min_interval
+                self.last_sent = {user: sent for user, sent in self.last_sent.items() if sent > cutoff}
+
+    def flush(self):
+        """Emit everything pending for every user right away"""
+        with self.lock:
+            user_ids = list(self.pending)
+        for user_id in user_ids:
+            self.dispatch(user_id)
+
+    def stats(self):
+        """Queue depth, throughput and dispatch latency figures"""
+        with self.lock:
+            packets = self.metrics['packets']
+            return {
+                'queue_depth': sum(len(queue) for queue in self.pending.values()),
+                'users_waiting': len(self.pending),
+                'submitted': self.metrics['submitted'],
+                'dispatched': self.metrics['dispatched'],
+                'packets': packets,
+                'coalesced': self.metrics['coalesced'],
+                'failed': self.metrics['failed'],
+                'avg_latency_ms': round(1000 * self.metrics['latency_total'] / packets, 1) if packets else 0.0,
+                'max_latency_ms': round(1000 * self.max_latency, 1),
+            }
@@ -0,0 +1,43 @@
+"""
+Opaque cursor tokens for keyset pagination.
+
+A cursor is the sort key of the last row on the previous page, serialized
+as URL-safe base64 JSON so clients treat it as an opaque string and pass it
+back unchanged in ``after=``.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+def encode_cursor(**values):
+    """Pack the sort key of the last row on a page into a token"""
+    payload = {}
+    for name, value in values.items():
+        if isinstance(value, datetime):
+            payload[name] = {'dt': value.isoformat()}
+        else:
+            payload[name] = value
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpack a token made by encode_cursor, or return None if it is invalid"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+        if not isinstance(payload, dict):
+            return None
+        values = {}
+        for name, value in payload.items():
+            if isinstance(value, dict) and 'dt' in value:
+                value = datetime.fromisoformat(value['dt'])
+            values[name] = value
+        return values
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return None
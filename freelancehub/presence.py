@@ -0,0 +1,56 @@
+"""
+Registry of connected Socket.IO clients.
+
+Maps every socket id to its user and every user to their open sockets, so
+connecting, disconnecting and "is this user online?" are all dictionary
+operations.  A user with several tabs open has one socket per tab and stays
+online until the last one disconnects.
+"""
+
+import threading
+
+
+class PresenceRegistry:
+    """Tracks which users are online and through which sockets"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users_by_sid = {}   # sid -> user_id
+        self.sids_by_user = {}   # user_id -> set of sids
+
+    def connect(self, sid, user_id):
+        """Register a socket; returns True if this brought the user online"""
+        with self.lock:
+            self.users_by_sid[sid] = user_id
+            sids = self.sids_by_user.setdefault(user_id, set())
+            sids.add(sid)
+            return len(sids) == 1
+
+    def disconnect(self, sid):
+        """Forget a socket; returns (user_id, went_offline) or (None, False)"""
+        with self.lock:
+            user_id = self.users_by_sid.pop(sid, None)
+            if user_id is None:
+                return None, False
+            sids = self.sids_by_user.get(user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self.sids_by_user[user_id]
+                    return user_id, True
+            return user_id, False
+
+    def is_online(self, user_id):
+        return user_id in self.sids_by_user
+
+    def socket_count(self, user_id):
+        with self.lock:
+            return len(self.sids_by_user.get(user_id, ()))
+
+    def sids(self, user_id):
+        """Return a snapshot of the user's socket ids"""
+        with self.lock:
+            return list(self.sids_by_user.get(user_id, ()))
+
+    def online_count(self):
+        return len(self.sids_by_user)
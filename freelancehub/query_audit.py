@@ -0,0 +1,123 @@
+"""
+Query-plan audit.
+
+Requests every GET route through the test client - anonymously and as
+each given user - records the SELECTs they run, and asks the database how
+it would execute each one (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on
+Postgres).  Plans that read a whole table are flagged:
+
+    SQLite      "SCAN <table>" without an index
+    Postgres    "Seq Scan on <table>"
+
+On Postgres the plans are taken with enable_seqscan off, so that a small
+development database, where a sequential scan is always cheapest, still
+shows whether an index could be used at all.
+"""
+
+import re
+from contextlib import contextmanager
+
+from flask import url_for
+from sqlalchemy import event
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?! USING)(?:\s|$)')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+@contextmanager
+def capture_queries(engine):
+    """Collect (statement, parameters) for every SELECT run inside the block"""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def explain(engine, statement, parameters):
+    """Return the plan of one statement as a list of lines"""
+    with engine.connect() as connection:
+        if engine.dialect.name == 'sqlite':
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+            return [row[-1] for row in rows]
+        with connection.begin() as transaction:
+            if engine.dialect.name == 'postgresql':
+                # SET LOCAL ends with the transaction, so the pooled
+                # connection goes back with sequential scans enabled
+                connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters)
+            plan = [row[0] for row in rows]
+            transaction.rollback()
+        return plan
+
+
+def full_scans(dialect_name, plan):
+    """Return the tables a plan reads in full"""
+    pattern = SQLITE_FULL_SCAN if dialect_name == 'sqlite' else POSTGRES_FULL_SCAN
+    tables = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match:
+            tables.append(match.group(1))
+    return tables
+
+
+def audit_urls(app, url_values, variants=None, skip=('static', 'logout')):
+    """List the URLs to audit: every GET route, with its arguments filled in
+
+    url_values maps URL argument names to sample values; routes needing an
+    argument that is not there are left out.  variants maps an endpoint to
+    extra query-string argument dicts to request it with as well.
+    """
+    variants = variants or {}
+    urls = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint in skip or 'GET' not in rule.methods:
+            continue
+        if not all(argument in url_values for argument in rule.arguments):
+            continue
+        values = {argument: url_values[argument] for argument in rule.arguments}
+        with app.test_request_context():
+            urls.append((rule.endpoint, url_for(rule.endpoint, **values)))
+            for args in variants.get(rule.endpoint, []):
+                urls.append((rule.endpoint, url_for(rule.endpoint, **values, **args)))
+    return urls
+
+
+def audit(app, engine, urls, user_ids=(None,)):
+    """Request each URL as each user and explain the queries it ran
+
+    user_ids holds the users to log in as through Flask-Login's session
+    key, None meaning anonymous.  Returns one finding per distinct
+    statement: {'endpoint', 'url', 'statement', 'plan', 'full_scans'}.
+    """
+    findings = {}
+    for user_id in user_ids:
+        client = app.test_client()
+        if user_id is not None:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+        for endpoint, url in urls:
+            # A fresh app context per request, as outside the CLI: g and the
+            # session would otherwise carry over from one request to the next
+            with app.app_context(), capture_queries(engine) as captured:
+                client.get(url)
+            for statement, parameters in captured:
+                if statement in findings:
+                    continue
+                plan = explain(engine, statement, parameters)
+                findings[statement] = {
+                    'endpoint': endpoint,
+                    'url': url,
+                    'statement': statement,
+                    'plan': plan,
+                    'full_scans': full_scans(engine.dialect.name, plan),
+                }
+    return list(findings.values())
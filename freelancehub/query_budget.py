@@ -0,0 +1,66 @@
+"""
+Per-request query counting with per-route budgets.
+
+Every SQL statement run while handling a request is counted.  A view can
+declare how many it should need with @query_budget(n); views without one
+get QUERY_BUDGET_DEFAULT.  QUERY_BUDGET_MODE decides what happens when a
+request goes over:
+
+    off     nothing is counted (the default)
+    warn    a warning is logged naming the route and the count
+    raise   QueryBudgetExceeded is raised, failing the request - for tests
+
+In warn and raise mode every response carries an X-Query-Count header.
+Statements run with execution_options(query_budget=False) are not counted:
+one-off work, such as warming a process-wide cache, that is no route's cost.
+"""
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more queries than its route's budget allows"""
+
+
+def query_budget(limit):
+    """Declare the most queries a view should run per request"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_count' in g and context.execution_options.get('query_budget', True):
+        g.query_count += 1
+
+
+def init_query_budget(app):
+    """Count queries per request and check them against the budgets"""
+    app.config.setdefault('QUERY_BUDGET_MODE', 'off')
+    app.config.setdefault('QUERY_BUDGET_DEFAULT', 10)
+    if app.config['QUERY_BUDGET_MODE'] == 'off':
+        return
+    if not event.contains(Engine, 'before_cursor_execute', count_query):
+        event.listen(Engine, 'before_cursor_execute', count_query)
+
+    @app.before_request
+    def start_query_count():
+        g.query_count = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        count = g.get('query_count')
+        if count is None:
+            return response
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', app.config['QUERY_BUDGET_DEFAULT'])
+        response.headers['X-Query-Count'] = str(count)
+        if count > budget:
+            message = '%s ran %d queries, over its budget of %d' % (request.endpoint, count, budget)
+            if app.config['QUERY_BUDGET_MODE'] == 'raise':
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
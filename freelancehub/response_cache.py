@@ -0,0 +1,209 @@
+"""
+Cache of rendered responses for anonymous catalogue pages.
+
+Every cached response is stored with a set of tags naming what it shows
+("catalogue", "service:12", "category:Writing", ...).  Write paths
+invalidate tags, which drops every response carrying one of them, so pages
+stay cached until something they show actually changes.
+
+Two backends share one interface:
+
+    MemoryBackend   per-process LRU, the default
+    SQLiteBackend   one SQLite file shared by every worker on a host
+
+make_backend() picks one from a setting: "memory", "sqlite:///path", or
+"none" to turn caching off.
+"""
+
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from urllib.parse import urlencode
+
+
+def cache_key(path, args):
+    """Key for a path and its query arguments, ignoring their order and blank values"""
+    items = sorted((key, value) for key, value in args.items(multi=True) if value != '')
+    return path + ('?' + urlencode(items) if items else '')
+
+
+class MemoryBackend:
+    """LRU of up to max_entries responses, with a tag -> keys index"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (value, tags), least recently used first
+        self.keys_by_tag = {}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, tags):
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (value, tags)
+            for tag in tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._discard(next(iter(self.entries)))
+
+    def invalidate(self, tags):
+        """Drop every entry carrying any of the tags; returns how many"""
+        with self.lock:
+            keys = set()
+            for tag in tags:
+                keys |= self.keys_by_tag.get(tag, set())
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_tag.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self.keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_tag[tag]
+
+
+class SQLiteBackend:
+    """Responses in a SQLite file, so all workers share hits and invalidations"""
+
+    def __init__(self, path='response_cache.db', max_entries=512):
+        self.path = path[len('sqlite:///'):] if path.startswith('sqlite:///') else path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS response_cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE TABLE IF NOT EXISTS response_cache_tags (tag TEXT NOT NULL, key TEXT NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ix_response_cache_tags_tag ON response_cache_tags (tag)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ix_response_cache_tags_key ON response_cache_tags (key)')
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM response_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE response_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, tags):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._delete([key])
+                self.conn.execute('INSERT INTO response_cache (key, value, last_used) VALUES (?, ?, ?)',
+                                  (key, pickle.dumps(value), time.time()))
+                self.conn.executemany('INSERT INTO response_cache_tags (tag, key) VALUES (?, ?)',
+                                      [(tag, key) for tag in tags])
+                count = self.conn.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+                if count > self.max_entries:
+                    victims = self.conn.execute('SELECT key FROM response_cache ORDER BY last_used LIMIT ?',
+                                                (count - self.max_entries,)).fetchall()
+                    self._delete([victim for (victim,) in victims])
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def invalidate(self, tags):
+        tags = list(tags)
+        if not tags:
+            return 0
+        marks = ', '.join('?' * len(tags))
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                keys = [key for (key,) in self.conn.execute(
+                    'SELECT DISTINCT key FROM response_cache_tags WHERE tag IN (%s)' % marks, tags)]
+                self._delete(keys)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM response_cache')
+            self.conn.execute('DELETE FROM response_cache_tags')
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+    def _delete(self, keys):
+        if keys:
+            self.conn.executemany('DELETE FROM response_cache WHERE key = ?', [(key,) for key in keys])
+            self.conn.executemany('DELETE FROM response_cache_tags WHERE key = ?', [(key,) for key in keys])
+
+
+def make_backend(setting, max_entries=512):
+    """Build the backend named by a RESPONSE_CACHE setting, or None for no caching"""
+    if not setting or setting == 'memory':
+        return MemoryBackend(max_entries)
+    if setting == 'none':
+        return None
+    if setting.startswith('sqlite:'):
+        return SQLiteBackend(setting, max_entries)
+    raise ValueError('Unknown RESPONSE_CACHE backend: %s' % setting)
+
+
+class ResponseCache:
+    """Tagged response cache with hit/miss counters over a backend"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.counters = Counter()
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def get(self, key):
+        value = self.backend.get(key)
+        self.counters['hits' if value is not None else 'misses'] += 1
+        return value
+
+    def set(self, key, value, tags):
+        self.backend.set(key, value, set(tags))
+        self.counters['stores'] += 1
+
+    def invalidate(self, tags):
+        if self.enabled and tags:
+            self.counters['invalidated'] += self.backend.invalidate(set(tags))
+
+    def stats(self):
+        lookups = self.counters['hits'] + self.counters['misses']
+        return {
+            'backend': type(self.backend).__name__ if self.enabled else None,
+            'entries': len(self.backend) if self.enabled else 0,
+            'hits': self.counters['hits'],
+            'misses': self.counters['misses'],
+            'hit_rate': round(self.counters['hits'] / lookups, 3) if lookups else 0.0,
+            'stores': self.counters['stores'],
+            'invalidated': self.counters['invalidated'],
+        }
@@ -6,7 +6,7 @@ This script runs the enhanced version of FreelanceHub with real-time features.
 
 import os
 import sys
-from app import app, socketio, db
+from app import app, socketio, engine_settings, load_indexes, upgrade_database
 
 def main():
     """Main function to run the dynamic FreelanceHub application"""
@@ -14,10 +14,14 @@ def main():
     print("🚀 Starting Dynamic FreelanceHub...")
     print("=" * 50)
     
-    # Create database tables
+    # Create or upgrade the database schema
     with app.app_context():
-        db.create_all()
+        upgrade_database()
         print("✅ Database initialized")
+        for line in engine_settings():
+            print(f"   • {line}")
+        load_indexes()
+        print("✅ Search and trending indexes loaded")
     
     # Check if static/js directory exists
     js_dir = os.path.join('static', 'js')
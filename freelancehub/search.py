@@ -0,0 +1,227 @@
+"""
+Full-text search for the FreelanceHub service catalogue.
+
+Services are indexed on their title, description, category and the
+freelancer's skills and ranked with BM25.  SQLite FTS5 is used when the
+sqlite3 module supports it; otherwise a pure-Python inverted index with the
+same tokenizer and ranking takes over.
+"""
+
+import math
+import re
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+# Field weights used for BM25 scoring (title matches count the most)
+FIELD_WEIGHTS = {
+    'title': 10.0,
+    'description': 1.0,
+    'category': 5.0,
+    'skills': 2.0,
+}
+
+# Maximum number of vocabulary terms a trailing prefix may expand to
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def fts5_available():
+    """Check whether the sqlite3 module was built with FTS5"""
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE VIRTUAL TABLE fts5_probe USING fts5(body)')
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class FTS5Backend:
+    """BM25-ranked search backed by an in-memory SQLite FTS5 table"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE services_fts USING fts5("
+            "title, description, category, skills, category_key UNINDEXED, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        self.weights = ', '.join(str(FIELD_WEIGHTS[f]) for f in ('title', 'description', 'category', 'skills'))
+
+    def clear(self):
+        self.conn.execute('DELETE FROM services_fts')
+
+    def add(self, doc):
+        self.conn.execute('DELETE FROM services_fts WHERE rowid = ?', (doc['id'],))
+        self.conn.execute(
+            'INSERT INTO services_fts (rowid, title, description, category, skills, category_key) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (doc['id'], doc.get('title') or '', doc.get('description') or '',
+             doc.get('category') or '', doc.get('skills') or '', doc.get('category') or '')
+        )
+
+    def remove(self, doc_id):
+        self.conn.execute('DELETE FROM services_fts WHERE rowid = ?', (doc_id,))
+
+    def search(self, tokens, category=None, limit=None):
+        terms = ['"%s"' % t for t in tokens[:-1]] + ['"%s"*' % tokens[-1]]
+        sql = 'SELECT rowid FROM services_fts WHERE services_fts MATCH ?'
+        params = [' '.join(terms)]
+        if category:
+            sql += ' AND category_key = ?'
+            params.append(category)
+        sql += ' ORDER BY bm25(services_fts, %s), rowid DESC' % self.weights
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+
+class InvertedIndexBackend:
+    """Pure-Python inverted index with BM25 ranking"""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.postings = {}      # term -> {doc_id: weighted term frequency}
+        self.doc_terms = {}     # doc_id -> set of terms (for removal)
+        self.doc_lengths = {}   # doc_id -> weighted document length
+        self.categories = {}    # doc_id -> category
+        self.vocabulary = []    # sorted terms, used for prefix expansion
+        self.total_length = 0.0
+
+    def add(self, doc):
+        doc_id = doc['id']
+        self.remove(doc_id)
+
+        frequencies = Counter()
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(doc.get(field)):
+                frequencies[token] += weight
+                length += weight
+
+        for term, tf in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                insort(self.vocabulary, term)
+            postings[doc_id] = tf
+
+        self.doc_terms[doc_id] = set(frequencies)
+        self.doc_lengths[doc_id] = length
+        self.categories[doc_id] = doc.get('category')
+        self.total_length += length
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect_left(self.vocabulary, term)]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        self.categories.pop(doc_id, None)
+
+    def expand_prefix(self, prefix):
+        """Return the vocabulary terms starting with prefix"""
+        terms = []
+        position = bisect_left(self.vocabulary, prefix)
+        while position < len(self.vocabulary) and len(terms) < MAX_PREFIX_EXPANSION:
+            term = self.vocabulary[position]
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+            position += 1
+        return terms
+
+    def search(self, tokens, category=None, limit=None):
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return []
+        average_length = self.total_length / doc_count
+
+        # Every query term must match; the last one is matched as a prefix
+        # because live search sends partially typed words.
+        term_groups = [[t] for t in tokens[:-1]] + [self.expand_prefix(tokens[-1])]
+        scores = None
+        for group in sorted(term_groups, key=lambda g: sum(len(self.postings.get(t, ())) for t in g)):
+            group_scores = {}
+            for term in group:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if scores is not None and doc_id not in scores:
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                    group_scores[doc_id] = group_scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+            if scores is None:
+                scores = group_scores
+            else:
+                scores = {d: scores[d] + s for d, s in group_scores.items()}
+            if not scores:
+                return []
+
+        if category:
+            scores = {d: s for d, s in scores.items() if self.categories.get(d) == category}
+
+        ranked = sorted(scores, key=lambda d: (-scores[d], -d))
+        return ranked[:limit] if limit else ranked
+
+
+class SearchIndex:
+    """Thread-safe catalogue search index with incremental maintenance"""
+
+    def __init__(self, use_fts5=None):
+        if use_fts5 is None:
+            use_fts5 = fts5_available()
+        self.backend = FTS5Backend() if use_fts5 else InvertedIndexBackend()
+        self.lock = threading.Lock()
+        self.built = False
+
+    @property
+    def backend_name(self):
+        return 'fts5' if isinstance(self.backend, FTS5Backend) else 'python'
+
+    def rebuild(self, docs):
+        """Replace the index contents with the given service documents"""
+        with self.lock:
+            self.backend.clear()
+            for doc in docs:
+                self.backend.add(doc)
+            self.built = True
+
+    def add(self, doc):
+        """Index (or re-index) a single service document"""
+        with self.lock:
+            self.backend.add(doc)
+
+    def remove(self, doc_id):
+        """Drop a service from the index"""
+        with self.lock:
+            self.backend.remove(doc_id)
+
+    def search(self, query, category=None, limit=None):
+        """Return service ids matching every query word, best match first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self.lock:
+            return self.backend.search(tokens, category=category, limit=limit)
@@ -3,6 +3,15 @@ class FreelanceHubDynamic {
     constructor() {
         this.socket = null;
         this.notifications = [];
+        this.statsRequests = new Map();
+        this.pendingStats = new Map();
+        // Chat: last sequence number seen per order, and sent messages
+        // still waiting for the server's acknowledgement (by client id)
+        this.chatLastSeq = {};
+        this.unackedMessages = new Map();
+        this.sentClientIds = new Set();
+        // Last response and ETag per API URL, for conditional requests
+        this.conditionalCache = new Map();
         this.init();
     }
 
@@ -10,52 +19,121 @@ class FreelanceHubDynamic {
         this.initSocketIO();
         this.initNotifications();
         this.initLiveSearch();
+        this.initInfiniteScroll();
         this.initTrendingServices();
         this.initUserStats();
+        this.initChat();
     }
 
     initSocketIO() {
-        // Initialize Socket.IO connection
-        this.socket = io();
+        // Websocket only: with several server workers a long-polling
+        // session could land on a worker that does not know it
+        this.socket = io({ transports: ['websocket'] });
         
         this.socket.on('connect', () => {
             console.log('Connected to server');
             this.socket.emit('join_room', { user_id: this.getCurrentUserId() });
+            // Pick up anything pushed while this page was disconnected
+            this.fetchNotifications();
+            this.resumeChat();
         });
 
         this.socket.on('notification', (data) => {
-            this.showNotification(data.message, data.type);
+            this.receiveNotification(data);
+        });
+
+        // Several notifications coalesced into one packet
+        this.socket.on('notifications', (data) => {
+            this.receiveNotifications(data.notifications, data.summary);
         });
 
         this.socket.on('new_message', (data) => {
             this.handleNewMessage(data);
         });
+
+        this.socket.on('chat_replay', (data) => {
+            // The replay is what the server has: numbers missing from it were
+            // never stored and will not come, so step past them
+            data.messages.forEach((message) => this.handleNewMessage(message, true));
+            if (this.chatLastSeq[data.order_id] !== undefined && data.last_seq > this.chatLastSeq[data.order_id]) {
+                this.chatLastSeq[data.order_id] = data.last_seq;
+            }
+            if (data.has_more) {
+                this.resumeChat();
+            }
+        });
     }
 
     initNotifications() {
-        // Check for notifications every 30 seconds
-        setInterval(() => {
-            this.fetchNotifications();
-        }, 30000);
-
-        // Initial fetch
-        this.fetchNotifications();
+        // Notifications arrive over the socket; the last sequence number seen
+        // is remembered across pages so a reconnect only fetches the gap.
+        this.unreadNotifications = 0;
+        this.notificationSeqKey = `notification_seq_${this.getCurrentUserId()}`;
+        const stored = localStorage.getItem(this.notificationSeqKey);
+        this.lastNotificationSeq = stored === null ? null : parseInt(stored, 10);
     }
 
     async fetchNotifications() {
+        if (!this.getCurrentUserId() || this.fetchingNotifications) {
+            return;
+        }
+
+        this.fetchingNotifications = true;
         try {
-            const response = await fetch('/api/notifications');
-            if (response.ok) {
-                const notifications = await response.json();
-                this.updateNotificationBadge(notifications.length);
-                
-                notifications.forEach(notification => {
-                    this.showNotification(notification.message, notification.type);
-                });
+            let hasMore = true;
+            while (hasMore) {
+                const firstVisit = this.lastNotificationSeq === null;
+                const url = firstVisit ? '/api/notifications' : `/api/notifications?since=${this.lastNotificationSeq}`;
+                const data = await this.fetchJSON(url);
+                if (!data) {
+                    break;
+                }
+
+                if (firstVisit) {
+                    // Nothing to replay on the first visit, just start from here
+                    this.setLastNotificationSeq(data.last_seq);
+                } else {
+                    data.notifications.forEach(notification => this.receiveNotification(notification));
+                }
+                hasMore = data.has_more;
             }
         } catch (error) {
             console.error('Error fetching notifications:', error);
+        } finally {
+            this.fetchingNotifications = false;
+        }
+    }
+
+    receiveNotification(notification) {
+        if (this.lastNotificationSeq !== null && notification.seq <= this.lastNotificationSeq) {
+            return;  // already shown
         }
+        this.setLastNotificationSeq(notification.seq);
+        this.updateNotificationBadge(++this.unreadNotifications);
+        this.showNotification(notification.message, notification.type);
+    }
+
+    receiveNotifications(notifications, summary) {
+        const fresh = notifications.filter(notification =>
+            this.lastNotificationSeq === null || notification.seq > this.lastNotificationSeq);
+        if (fresh.length === 0) {
+            return;
+        }
+        if (fresh.length === 1) {
+            this.receiveNotification(fresh[0]);
+            return;
+        }
+        this.setLastNotificationSeq(Math.max(...fresh.map(notification => notification.seq)));
+        this.unreadNotifications += fresh.length;
+        this.updateNotificationBadge(this.unreadNotifications);
+        const types = new Set(fresh.map(notification => notification.type));
+        const message = fresh.length === notifications.length ? summary : `${fresh.length} new notifications`;
+        this.showNotification(message, types.size === 1 ? fresh[0].type : 'info');
+    }
+
+    setLastNotificationSeq(seq) {
+        this.lastNotificationSeq = seq;
+        localStorage.setItem(this.notificationSeqKey, String(seq));
     }
 
     updateNotificationBadge(count) {
@@ -107,17 +185,30 @@ class FreelanceHubDynamic {
 
     async performLiveSearch(query) {
         try {
-            const response = await fetch(`/api/search_services?q=${encodeURIComponent(query)}`);
+            const response = await fetch(`/api/typeahead?q=${encodeURIComponent(query)}`);
             if (response.ok) {
-                const results = await response.json();
-                this.displaySearchResults(results);
+                const suggestions = await response.json();
+                if (suggestions.services.length === 0 && suggestions.queries.length === 0) {
+                    // Nothing starts with what was typed; maybe it has a typo
+                    await this.performCorrectedSearch(query);
+                    return;
+                }
+                this.displaySearchResults(suggestions.services, suggestions.queries);
             }
         } catch (error) {
             console.error('Error performing live search:', error);
         }
     }
 
-    displaySearchResults(results) {
+    async performCorrectedSearch(query) {
+        const response = await fetch(`/api/search_services?q=${encodeURIComponent(query)}`);
+        if (response.ok) {
+            const search = await response.json();
+            this.displaySearchResults(search.results, [], search.did_you_mean);
+        }
+    }
+
+    displaySearchResults(results, queries = [], didYouMean = null) {
         let searchResultsContainer = document.getElementById('live-search-results');
         
         if (!searchResultsContainer) {
@@ -131,12 +222,21 @@ class FreelanceHubDynamic {
             searchContainer.appendChild(searchResultsContainer);
         }
         
-        if (results.length === 0) {
+        if (results.length === 0 && queries.length === 0 && !didYouMean) {
             searchResultsContainer.innerHTML = '<div class="p-3 text-muted">No services found</div>';
             return;
         }
         
-        searchResultsContainer.innerHTML = results.map(service => `
+        const correction = didYouMean ? `
+            <a href="/services?search=${encodeURIComponent(didYouMean)}" class="d-block px-3 py-2 text-decoration-none border-bottom">
+                Did you mean <span class="fw-bold">${this.escapeHtml(didYouMean)}</span>?
+            </a>
+        ` : '';
+        searchResultsContainer.innerHTML = correction + queries.map(query => `
+            <a href="/services?search=${encodeURIComponent(query)}" class="d-block px-3 py-2 text-decoration-none border-bottom text-muted">
+                <i class="fas fa-search me-2"></i>${query}
+            </a>
+        `).join('') + results.map(service => `
             <a href="/service/${service.id}" class="d-block p-3 text-decoration-none border-bottom">
                 <div class="fw-bold">${service.title}</div>
                 <div class="text-muted small">by ${service.freelancer} • $${service.price}</div>
@@ -144,11 +244,127 @@ class FreelanceHubDynamic {
         `).join('');
     }
 
-    async initTrendingServices() {
+    initInfiniteScroll() {
+        const grid = document.getElementById('services-grid');
+        const loadMore = document.getElementById('services-load-more');
+        if (!grid || !loadMore || !('IntersectionObserver' in window)) {
+            // Without IntersectionObserver the "Load more" link still pages normally
+            return;
+        }
+
+        this.loadingPage = false;
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                this.loadNextPage(grid, loadMore, observer);
+            }
+        }, { rootMargin: '400px' });
+        observer.observe(loadMore);
+    }
+
+    async loadNextPage(grid, loadMore, observer) {
+        const cursor = grid.dataset.nextCursor;
+        if (!cursor || this.loadingPage) {
+            return;
+        }
+
+        this.loadingPage = true;
         try {
-            const response = await fetch('/api/trending_services');
+            const params = new URLSearchParams({
+                category: grid.dataset.category || '',
+                search: grid.dataset.search || '',
+                after: cursor
+            });
+            const response = await fetch(`/api/services?${params}`);
             if (response.ok) {
-                const trendingServices = await response.json();
+                const page = await response.json();
+                grid.insertAdjacentHTML('beforeend', page.services.map(service => this.renderServiceCard(service, page.can_order)).join(''));
+                grid.dataset.nextCursor = page.next || '';
+                if (!page.next) {
+                    observer.disconnect();
+                    loadMore.remove();
+                }
+            }
+        } catch (error) {
+            console.error('Error loading more services:', error);
+        } finally {
+            this.loadingPage = false;
+        }
+    }
+
+    renderServiceCard(service, canOrder = false) {
+        // Same markup as the cards in services.html
+        const created = new Date(service.created_at).toLocaleDateString('en-US', { month: 'short', day: '2-digit', year: 'numeric' });
+        const description = service.truncated ? `${service.description}...` : service.description;
+        const orderButton = canOrder ? `
+                                <a href="/order/${service.id}" class="btn btn-primary btn-sm">
+                                    <i class="fas fa-shopping-cart me-1"></i>Order
+                                </a>` : '';
+        return `
+            <div class="col-md-6 col-lg-4">
+                <div class="card service-card h-100">
+                    <div class="card-body">
+                        <div class="d-flex justify-content-between align-items-start mb-3">
+                            <span class="category-badge">${this.escapeHtml(service.category)}</span>
+                            <span class="price-tag">$${Math.round(service.price)}</span>
+                        </div>
+                        <h5 class="card-title">${this.escapeHtml(service.title)}</h5>
+                        <p class="card-text text-muted">${this.escapeHtml(description)}</p>
+                        <div class="d-flex justify-content-between align-items-center mb-3">
+                            <div class="d-flex align-items-center">
+                                <i class="fas fa-user text-primary me-2"></i>
+                                <span class="text-muted">${this.escapeHtml(service.freelancer)}</span>
+                            </div>
+                            <div class="d-flex align-items-center">
+                                <i class="fas fa-clock text-primary me-2"></i>
+                                <span class="text-muted">${service.delivery_time} days</span>
+                            </div>
+                        </div>
+                        <div class="d-flex justify-content-between align-items-center">
+                            <small class="text-muted">
+                                <i class="fas fa-calendar me-1"></i>${created}
+                            </small>
+                            <div class="d-flex gap-2">
+                                <a href="/service/${service.id}" class="btn btn-outline-primary btn-sm">
+                                    <i class="fas fa-eye me-1"></i>View
+                                </a>${orderButton}
+                            </div>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        `;
+    }
+
+    async fetchJSON(url) {
+        // Revalidate with the ETag of our last copy; a 304 means it is still current
+        const cached = this.conditionalCache.get(url);
+        const headers = cached ? { 'If-None-Match': cached.etag } : {};
+        const response = await fetch(url, { headers: headers, cache: 'no-store' });
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
+        if (!response.ok) {
+            return null;
+        }
+
+        const data = await response.json();
+        const etag = response.headers.get('ETag');
+        if (etag) {
+            this.conditionalCache.set(url, { etag: etag, data: data });
+        }
+        return data;
+    }
+
+    escapeHtml(text) {
+        const element = document.createElement('div');
+        element.textContent = text == null ? '' : String(text);
+        return element.innerHTML;
+    }
+
+    async initTrendingServices() {
+        try {
+            const trendingServices = await this.fetchJSON('/api/trending_services');
+            if (trendingServices) {
                 this.displayTrendingServices(trendingServices);
             }
         } catch (error) {
@@ -181,23 +397,54 @@ class FreelanceHubDynamic {
         }
     }
 
-    async initUserStats() {
+    initUserStats() {
+        // The current user's profile widget plus any element asking for a
+        // user's stats with data-stats-user-id; all go out in one request
         const userId = this.getCurrentUserId();
-        if (userId) {
+        const profileStats = document.getElementById('user-stats');
+        if (userId && profileStats) {
+            this.getUserStats(userId).then(stats => stats && this.displayUserStats(stats, profileStats));
+        }
+
+        document.querySelectorAll('[data-stats-user-id]').forEach(element => {
+            this.getUserStats(element.dataset.statsUserId).then(stats => stats && this.displayUserStats(stats, element));
+        });
+    }
+
+    getUserStats(userId) {
+        // Calls made in the same tick are coalesced into one batched request
+        userId = String(userId);
+        if (!this.statsRequests.has(userId)) {
+            this.statsRequests.set(userId, new Promise(resolve => {
+                if (this.pendingStats.size === 0) {
+                    setTimeout(() => this.flushStatsRequests(), 0);
+                }
+                this.pendingStats.set(userId, resolve);
+            }));
+        }
+        return this.statsRequests.get(userId);
+    }
+
+    async flushStatsRequests() {
+        const pending = this.pendingStats;
+        this.pendingStats = new Map();
+
+        const ids = Array.from(pending.keys());
+        const results = {};
+        for (let i = 0; i < ids.length; i += 100) {
             try {
-                const response = await fetch(`/api/user_stats/${userId}`);
-                if (response.ok) {
-                    const stats = await response.json();
-                    this.displayUserStats(stats);
+                const stats = await this.fetchJSON(`/api/user_stats?ids=${ids.slice(i, i + 100).join(',')}`);
+                if (stats) {
+                    Object.assign(results, stats);
                 }
             } catch (error) {
                 console.error('Error fetching user stats:', error);
             }
         }
+        pending.forEach((resolve, id) => resolve(results[id] || null));
     }
 
-    displayUserStats(stats) {
-        const container = document.getElementById('user-stats');
+    displayUserStats(stats, container) {
         if (container) {
             if (stats.services_count !== undefined) {
                 // Freelancer stats
@@ -263,22 +510,142 @@ class FreelanceHubDynamic {
         }
     }
 
-    handleNewMessage(data) {
-        // Handle incoming chat messages
+    async initChat() {
+        const container = document.getElementById('chat-messages');
+        const input = document.getElementById('chat-input');
+        const button = document.getElementById('send-message');
+        if (!container || !container.dataset.orderId) {
+            return;
+        }
+
+        const orderId = parseInt(container.dataset.orderId, 10);
+        const send = () => {
+            const message = input.value.trim();
+            if (message) {
+                this.sendChatMessage(orderId, message);
+                input.value = '';
+            }
+        };
+        button.addEventListener('click', send);
+        input.addEventListener('keypress', (e) => {
+            if (e.key === 'Enter') {
+                send();
+            }
+        });
+
+        try {
+            const response = await fetch(`/api/chat/${orderId}`);
+            if (response.ok) {
+                const data = await response.json();
+                this.chatLastSeq[orderId] = data.messages.length > 0 ? data.messages[0].seq - 1 : 0;
+                // Stored history, like a replay, may skip numbers that were never stored
+                data.messages.forEach((message) => this.handleNewMessage(message, true));
+            }
+        } catch (error) {
+            console.error('Error loading chat history:', error);
+        }
+        // Anything sent between the history request and now
+        this.resumeChat();
+    }
+
+    sendChatMessage(orderId, message) {
+        const clientId = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        const pending = { order_id: orderId, message: message, client_id: clientId };
+        pending.element = this.renderChatMessage({
+            user_id: this.getCurrentUserId(),
+            username: 'You',
+            message: message,
+            timestamp: new Date().toISOString()
+        }, true);
+        this.unackedMessages.set(clientId, pending);
+        this.sentClientIds.add(clientId);
+        this.emitChatMessage(pending);
+    }
+
+    emitChatMessage(pending) {
+        if (!this.socket || !this.socket.connected) {
+            return; // resent by resumeChat() once the socket is back
+        }
+        const { element, ...payload } = pending;
+        this.socket.timeout(5000).emit('send_message', payload, (err, ack) => {
+            if (err) {
+                return; // no ack in time; resent on reconnect, the server drops duplicates
+            }
+            if (ack && ack.error) {
+                element.classList.add('text-danger');
+                this.unackedMessages.delete(pending.client_id);
+                return;
+            }
+            this.acknowledgeChatMessage(pending.client_id);
+        });
+    }
+
+    acknowledgeChatMessage(clientId) {
+        const pending = this.unackedMessages.get(clientId);
+        if (pending) {
+            pending.element.classList.remove('pending');
+            pending.element.style.opacity = '';
+            this.unackedMessages.delete(clientId);
+        }
+    }
+
+    resumeChat() {
+        // Ask only for the messages after the last one seen in each order,
+        // then resend our own messages the server never acknowledged
+        if (!this.socket || !this.socket.connected) {
+            return;
+        }
+        if (Object.keys(this.chatLastSeq).length > 0) {
+            this.socket.emit('resume_chat', { orders: this.chatLastSeq });
+        }
+        this.unackedMessages.forEach((pending) => this.emitChatMessage(pending));
+    }
+
+    handleNewMessage(data, replayed = false) {
+        // Handle incoming chat messages, in sequence order and without repeats
+        const lastSeq = this.chatLastSeq[data.order_id];
+        if (lastSeq === undefined || data.seq <= lastSeq) {
+            return; // history not loaded yet (it will include this), or a repeat
+        }
+        if (data.seq > lastSeq + 1 && !replayed) {
+            // Missed something; the replay brings this message too
+            this.resumeChat();
+            return;
+        }
+        this.chatLastSeq[data.order_id] = data.seq;
+
+        if (data.client_id && this.sentClientIds.has(data.client_id)) {
+            this.acknowledgeChatMessage(data.client_id);
+            return; // sent from this page, already shown
+        }
+        this.renderChatMessage(data, false);
+    }
+
+    renderChatMessage(data, pending) {
         const chatContainer = document.getElementById('chat-messages');
-        if (chatContainer) {
-            const messageElement = document.createElement('div');
-            messageElement.className = `message ${data.user_id === this.getCurrentUserId() ? 'sent' : 'received'}`;
-            messageElement.innerHTML = `
-                <div class="message-content">
-                    <strong>${data.username}</strong>
-                    <p>${data.message}</p>
-                    <small class="text-muted">${new Date(data.timestamp).toLocaleTimeString()}</small>
-                </div>
-            `;
-            chatContainer.appendChild(messageElement);
-            chatContainer.scrollTop = chatContainer.scrollHeight;
+        if (!chatContainer) {
+            return null;
         }
+        const placeholder = chatContainer.querySelector('.text-center.text-muted');
+        if (placeholder) {
+            placeholder.remove();
+        }
+        const messageElement = document.createElement('div');
+        const sent = String(data.user_id) === String(this.getCurrentUserId());
+        messageElement.className = `message ${sent ? 'sent' : 'received'}${pending ? ' pending' : ''}`;
+        if (pending) {
+            messageElement.style.opacity = '0.6';
+        }
+        messageElement.innerHTML = `
+            <div class="message-content">
+                <strong>${this.escapeHtml(data.username)}</strong>
+                <p>${this.escapeHtml(data.message)}</p>
+                <small class="text-muted">${new Date(data.timestamp).toLocaleTimeString()}</small>
+            </div>
+        `;
+        chatContainer.appendChild(messageElement);
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+        return messageElement;
     }
 
     getCurrentUserId() {
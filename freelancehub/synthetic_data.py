@@ -0,0 +1,352 @@
+"""
+Synthetic marketplace data for load testing.
+
+`flask generate-data` fills the database with users, services, orders,
+payments and reviews at production-like volumes, e.g.
+
+    flask generate-data --users 100000 --services 1000000 --orders 10000000
+
+The distributions are skewed the way a marketplace's are:
+
+    categories      Zipf-like: a couple of categories hold most services
+    freelancers     Pareto: a fifth of them offer most of the services
+    services        Pareto popularity: a small share gets most orders
+    clients         Pareto: a few clients place many orders
+    time            activity grows over the period, so recent days are
+                    busier; order status follows age (old orders are
+                    mostly completed, recent ones pending or in progress)
+
+Each table is generated in creation order, so ids increase with
+created_at as they would in production, and a service or order only
+goes to users and services that existed at the time.
+
+Rows are built as plain dicts with explicit ids, so nothing has to be
+read back, and written with Core executemany inserts, chunk_size orders
+(or users, or services) per transaction.  Every user gets the same
+password hash, computed once.  Loading into empty tables, the secondary
+indexes are dropped first and built once at the end, which is much
+cheaper than maintaining them row by row.
+
+The output depends only on the seed, the volumes and the end date: each
+table draws from its own random stream, one row at a time, so the chunk
+size does not change it either.
+"""
+
+import bisect
+import hashlib
+import itertools
+import math
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+PASSWORD = 'password123'
+PBKDF2_ITERATIONS = 600000
+
+FIRST_NAMES = ('olivia', 'liam', 'emma', 'noah', 'ava', 'oliver', 'sophia', 'elijah', 'mia', 'lucas',
+               'amelia', 'mateo', 'harper', 'levi', 'ella', 'ezra', 'aria', 'kai', 'zoe', 'yusuf',
+               'elif', 'mehmet', 'ayse', 'deniz', 'priya', 'arjun', 'chen', 'mei', 'sofia', 'diego')
+
+# Words to build titles, descriptions and skills from, per category
+CATEGORY_WORDS = {
+    'Web Development': (('Website', 'Landing Page', 'E-commerce Store', 'Web App', 'WordPress Site', 'REST API'),
+                        ('Python', 'Django', 'React', 'JavaScript', 'WordPress', 'Node.js', 'PHP', 'SQL')),
+    'Graphic Design': (('Logo', 'Brand Identity', 'Business Card', 'Poster', 'UI Design', 'Infographic'),
+                       ('Photoshop', 'Illustrator', 'Figma', 'Branding', 'UI/UX', 'Typography')),
+    'Digital Marketing': (('SEO Audit', 'Ad Campaign', 'Social Media Plan', 'Email Campaign', 'Analytics Setup'),
+                          ('SEO', 'Google Ads', 'Facebook Ads', 'Analytics', 'Email Marketing')),
+    'Writing': (('Blog Articles', 'Website Copy', 'Product Descriptions', 'Press Release', 'E-book'),
+                ('Copywriting', 'SEO Writing', 'Blogging', 'Editing', 'Proofreading')),
+    'Video & Animation': (('Explainer Video', 'Logo Animation', 'Video Edit', 'Intro Video', 'Whiteboard Animation'),
+                          ('After Effects', 'Premiere Pro', 'Animation', 'Motion Graphics')),
+    'Music & Audio': (('Jingle', 'Podcast Edit', 'Voice Over', 'Mixing and Mastering', 'Background Music'),
+                      ('Mixing', 'Mastering', 'Voice Acting', 'Composition', 'Audio Editing')),
+}
+GENERIC_WORDS = (('Project', 'Package', 'Consultation'), ('Consulting', 'Project Management'))
+ADJECTIVES = ('Professional', 'Custom', 'Modern', 'Premium', 'Fast', 'Complete', 'Creative', 'Affordable')
+DESCRIPTIONS = ('Delivered on time with unlimited revisions.', 'Tailored to your brand and audience.',
+                'Includes source files and a short handover call.', 'Built to the latest standards.',
+                'Over a hundred satisfied clients so far.', 'Message me before ordering to discuss details.')
+REQUIREMENTS = ('Please follow the attached brief.', 'Match our current brand colours.',
+                'We need this before our launch next month.', 'Keep it simple and clean.')
+COMMENTS = {1: 'Did not deliver what was agreed.', 2: 'Late and needed many changes.', 3: 'Okay, nothing special.',
+            4: 'Good work, would order again.', 5: 'Excellent, exceeded expectations!'}
+
+# Relative frequency of review ratings 1 to 5
+RATING_WEIGHTS = (3, 4, 8, 25, 60)
+# Order statuses by age: old orders are settled, recent ones still open
+SETTLED_STATUSES = (('completed', 86), ('cancelled', 8), ('paid', 2), ('pending', 4))
+OPEN_STATUSES = (('pending', 25), ('paid', 35), ('in_progress', 30), ('completed', 5), ('cancelled', 5))
+PAID_STATUSES = ('paid', 'in_progress', 'completed')
+
+
+def password_hash(password, seed):
+    """A Werkzeug pbkdf2 hash of password, salted from the seed so it is reproducible"""
+    salt = hashlib.sha256(('salt-%s' % seed).encode()).hexdigest()[:16]
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), PBKDF2_ITERATIONS).hex()
+    return 'pbkdf2:sha256:%d$%s$%s' % (PBKDF2_ITERATIONS, salt, digest)
+
+
+class WeightedPicker:
+    """Picks indexes in proportion to their weights, one random number per pick"""
+
+    def __init__(self, weights):
+        self.cumulative = array('d', itertools.accumulate(weights))
+
+    def pick(self, rng, limit=None):
+        """Pick among the first limit indexes (all by default)"""
+        limit = limit or len(self.cumulative)
+        return min(bisect.bisect(self.cumulative, rng.random() * self.cumulative[limit - 1], 0, limit), limit - 1)
+
+
+class Timeline:
+    """Moments in the days before end, with activity growing by e**growth over the period"""
+
+    def __init__(self, end, days, growth=1.5):
+        self.start = end - timedelta(days=days)
+        self.span = days * 86400.0
+        self.growth = growth
+
+    def moment(self, fraction):
+        """Seconds since the start at which that fraction of the activity has happened"""
+        return self.span * math.log1p(fraction * math.expm1(self.growth)) / self.growth
+
+    def fraction(self, moment):
+        return math.expm1(self.growth * moment / self.span) / math.expm1(self.growth)
+
+    def ascending(self, rng, count, after=0.0):
+        """count moments not before after, in increasing order, one random number each
+
+        Sorted uniform fractions are generated directly (as one minus the
+        running product of U ** (1 / i), which gives them largest first), so
+        no list of count values is built or sorted.
+        """
+        floor = self.fraction(after)
+        remaining = 1.0
+        for left in range(count, 0, -1):
+            remaining *= rng.random() ** (1.0 / left)
+            yield self.moment(floor + (1.0 - remaining) * (1.0 - floor))
+
+    def clamp(self, moment):
+        return min(moment, self.span)
+
+    def datetime(self, moment):
+        return self.start + timedelta(seconds=moment)
+
+
+class SyntheticMarketplace:
+    """Generates and bulk-inserts one data set
+
+    tables maps 'user', 'service', 'order', 'payment' and 'review' to the
+    SQLAlchemy tables to fill.
+    """
+
+    def __init__(self, tables, categories, users, services, orders, seed=0, end=None, days=365,
+                 freelancer_share=0.2, review_rate=0.6):
+        if services and not users:
+            raise ValueError('Services need users to offer them')
+        if orders and not (services and users > 1):
+            raise ValueError('Orders need services and at least two users')
+        self.tables = tables
+        self.categories = list(categories)
+        self.users, self.services, self.orders = users, services, orders
+        self.seed = seed
+        self.end = end or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.timeline = Timeline(self.end, days)
+        self.freelancer_share = freelancer_share
+        self.review_rate = review_rate
+
+    def rng(self, stream):
+        return random.Random('%s-%s' % (self.seed, stream))
+
+    def write(self, engine, chunk_size=10000, log=print):
+        """Insert everything; returns {table name: rows inserted}"""
+        self.next_ids = {name: self.first_id(engine, table) for name, table in self.tables.items()}
+        deferred = []
+        if all(next_id == 1 for next_id in self.next_ids.values()):
+            deferred = [index for table in self.tables.values() for index in table.indexes if not index.unique]
+            for index in deferred:
+                index.drop(engine, checkfirst=True)
+        try:
+            counts = self.insert_all(engine, chunk_size, log)
+        finally:
+            started = time.monotonic()
+            for index in deferred:
+                index.create(engine, checkfirst=True)
+            if deferred:
+                log('indexes  %10d built   in %6.1fs' % (len(deferred), time.monotonic() - started))
+        if engine.dialect.name == 'postgresql':
+            self.advance_sequences(engine)
+        return counts
+
+    def insert_all(self, engine, chunk_size, log):
+        counts = dict.fromkeys(self.tables, 0)
+        for batches in (self.user_batches(chunk_size), self.service_batches(chunk_size),
+                        self.order_batches(chunk_size)):
+            started = time.monotonic()
+            written = dict.fromkeys(self.tables, 0)
+            for batch in batches:
+                with engine.begin() as connection:
+                    for name, rows in batch.items():
+                        if rows:
+                            connection.execute(self.tables[name].insert(), rows)
+                            written[name] += len(rows)
+            elapsed = time.monotonic() - started
+            for name in (name for name in written if written[name]):
+                log('%-8s %10d rows in %6.1fs' % (name, written[name], elapsed))
+                counts[name] += written[name]
+        return counts
+
+    def first_id(self, engine, table):
+        """Append after any existing rows"""
+        with engine.connect() as connection:
+            return (connection.execute(sa.select(sa.func.max(table.c.id))).scalar() or 0) + 1
+
+    def advance_sequences(self, engine):
+        """Explicit ids leave Postgres id sequences behind; move them past the new rows"""
+        preparer = engine.dialect.identifier_preparer
+        with engine.begin() as connection:
+            for table in self.tables.values():
+                name = preparer.format_table(table)
+                connection.exec_driver_sql(
+                    "SELECT setval(pg_get_serial_sequence('%s', 'id'), (SELECT max(id) FROM %s))" % (name, name))
+
+    def user_batches(self, chunk_size):
+        rng = self.rng('users')
+        hashed = password_hash(PASSWORD, self.seed)
+        first_id = self.next_ids['user']
+        self.freelancers, self.freelancer_times = array('l'), array('d')
+        self.clients, self.client_times = array('l'), array('d')
+        moments = self.timeline.ascending(rng, self.users)
+        for chunk_start in range(0, self.users, chunk_size):
+            rows = []
+            for position in range(chunk_start, min(chunk_start + chunk_size, self.users)):
+                user_id = first_id + position
+                created = next(moments)
+                # The first two are a freelancer and a client, so both kinds always exist
+                is_freelancer = position == 0 or (position != 1 and rng.random() < self.freelancer_share)
+                username = '%s%d' % (rng.choice(FIRST_NAMES), user_id)
+                row = {'id': user_id, 'username': username, 'email': username + '@example.com',
+                       'password_hash': hashed, 'is_freelancer': is_freelancer, 'profile_picture': None,
+                       'bio': None, 'skills': None, 'hourly_rate': None,
+                       'created_at': self.timeline.datetime(created)}
+                if is_freelancer:
+                    words = CATEGORY_WORDS.get(rng.choice(self.categories), GENERIC_WORDS)[1]
+                    row.update(bio='%s freelancer. %s' % (rng.choice(ADJECTIVES), rng.choice(DESCRIPTIONS)),
+                               skills=', '.join(rng.sample(words, min(3, len(words)))),
+                               hourly_rate=float(rng.randrange(10, 150)))
+                    self.freelancers.append(user_id)
+                    self.freelancer_times.append(created)
+                else:
+                    self.clients.append(user_id)
+                    self.client_times.append(created)
+                rows.append(row)
+            yield {'user': rows}
+
+    def service_batches(self, chunk_size):
+        rng = self.rng('services')
+        first_id = self.next_ids['service']
+        categories = list(self.categories)
+        rng.shuffle(categories)
+        category_picker = WeightedPicker([1 / (rank + 1) ** 1.1 for rank in range(len(categories))])
+        freelancer_picker = WeightedPicker([rng.paretovariate(1.16) for _ in self.freelancers])
+        self.service_freelancers, self.service_prices = array('l'), array('d')
+        self.service_times, self.service_delivery = array('d'), array('l')
+        moments = self.timeline.ascending(rng, self.services, after=self.freelancer_times[0])
+        for chunk_start in range(0, self.services, chunk_size):
+            rows = []
+            for position in range(chunk_start, min(chunk_start + chunk_size, self.services)):
+                created = next(moments)
+                category = categories[category_picker.pick(rng)]
+                # Only freelancers who had signed up by then
+                freelancer = freelancer_picker.pick(rng, bisect.bisect(self.freelancer_times, created))
+                price = float(min(5000, max(5, round(math.exp(rng.gauss(4.8, 0.8))))))
+                delivery_time = rng.choice((1, 2, 3, 3, 5, 5, 7, 7, 10, 14, 21, 30))
+                thing = rng.choice(CATEGORY_WORDS.get(category, GENERIC_WORDS)[0])
+                rows.append({
+                    'id': first_id + position,
+                    'title': '%s %s' % (rng.choice(ADJECTIVES), thing),
+                    'description': 'I will create your %s. %s %s' % (
+                        thing.lower(), rng.choice(DESCRIPTIONS), rng.choice(DESCRIPTIONS)),
+                    'category': category,
+                    'price': price,
+                    'delivery_time': delivery_time,
+                    'freelancer_id': self.freelancers[freelancer],
+                    'created_at': self.timeline.datetime(created),
+                    'is_active': rng.random() < 0.95,
+                })
+                self.service_freelancers.append(self.freelancers[freelancer])
+                self.service_prices.append(price)
+                self.service_times.append(created)
+                self.service_delivery.append(delivery_time)
+            yield {'service': rows}
+
+    def order_batches(self, chunk_size):
+        """Orders with their payments and reviews, in the same transactions"""
+        rng = self.rng('orders')
+        order_id, payment_id, review_id = self.next_ids['order'], self.next_ids['payment'], self.next_ids['review']
+        first_service = self.next_ids['service']
+        service_picker = WeightedPicker([rng.paretovariate(1.1) for _ in range(self.services)])
+        client_picker = WeightedPicker([rng.paretovariate(1.5) for _ in self.clients])
+        settled_picker = WeightedPicker([weight for status, weight in SETTLED_STATUSES])
+        open_picker = WeightedPicker([weight for status, weight in OPEN_STATUSES])
+        rating_picker = WeightedPicker(RATING_WEIGHTS)
+        moments = self.timeline.ascending(rng, self.orders, after=max(self.service_times[0], self.client_times[0]))
+        for chunk_start in range(0, self.orders, chunk_size):
+            orders, payments, reviews = [], [], []
+            for _ in range(chunk_start, min(chunk_start + chunk_size, self.orders)):
+                created = next(moments)
+                # Only services and clients that existed by then
+                service = service_picker.pick(rng, bisect.bisect(self.service_times, created))
+                client = client_picker.pick(rng, bisect.bisect(self.client_times, created))
+                delivery = self.service_delivery[service] * 86400
+                if self.timeline.span - created > 2 * delivery + 7 * 86400:
+                    status = SETTLED_STATUSES[settled_picker.pick(rng)][0]
+                else:
+                    status = OPEN_STATUSES[open_picker.pick(rng)][0]
+                completed = None
+                if status == 'completed':
+                    completed = self.timeline.clamp(created + delivery * rng.uniform(0.5, 1.5))
+                amount = self.service_prices[service]
+                orders.append({
+                    'id': order_id,
+                    'client_id': self.clients[client],
+                    'service_id': first_service + service,
+                    'freelancer_id': self.service_freelancers[service],
+                    'status': status,
+                    'total_amount': amount,
+                    'requirements': rng.choice(REQUIREMENTS),
+                    'created_at': self.timeline.datetime(created),
+                    'completed_at': self.timeline.datetime(completed) if completed is not None else None,
+                })
+                if status in PAID_STATUSES:
+                    paid = self.timeline.clamp(created + rng.uniform(60, 6 * 3600))
+                    by_card = rng.random() < 0.75
+                    payments.append({
+                        'id': payment_id,
+                        'order_id': order_id,
+                        'amount': amount,
+                        'payment_method': 'credit_card' if by_card else 'paypal',
+                        'card_last4': '%04d' % rng.randrange(10000) if by_card else None,
+                        'status': 'completed',
+                        'transaction_id': '%032x' % rng.getrandbits(128),
+                        'created_at': self.timeline.datetime(paid),
+                        'completed_at': self.timeline.datetime(paid),
+                    })
+                    payment_id += 1
+                if completed is not None and rng.random() < self.review_rate:
+                    rating = rating_picker.pick(rng) + 1
+                    reviews.append({
+                        'id': review_id,
+                        'order_id': order_id,
+                        'reviewer_id': self.clients[client],
+                        'rating': rating,
+                        'comment': COMMENTS[rating],
+                        'created_at': self.timeline.datetime(self.timeline.clamp(completed + rng.uniform(0, 3 * 86400))),
+                    })
+                    review_id += 1
+                order_id += 1
+            yield {'order': orders, 'payment': payments, 'review': reviews}
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# app.py reads its settings from the environment when it is imported:
+# point it at a throwaway database before any test imports it
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['RESPONSE_CACHE'] = 'none'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
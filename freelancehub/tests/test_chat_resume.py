@@ -0,0 +1,62 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import app, db, socketio, chat_buffer, recent_chat, User, Service, Order, ChatMessage
+
+
+@pytest.fixture
+def order_id():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        freelancer = User(username='john', email='john@example.com', is_freelancer=True,
+                          password_hash=generate_password_hash('pw'))
+        client = User(username='alice', email='alice@example.com', password_hash=generate_password_hash('pw'))
+        db.session.add_all([freelancer, client])
+        db.session.commit()
+        service = Service(title='Logo design', description='A logo', category='Graphic Design',
+                          price=100, delivery_time=3, freelancer_id=freelancer.id)
+        db.session.add(service)
+        db.session.commit()
+        order = Order(client_id=client.id, service_id=service.id, freelancer_id=freelancer.id,
+                      total_amount=100, requirements='A fox')
+        db.session.add(order)
+        db.session.commit()
+        return order.id
+
+
+@pytest.fixture
+def chat(order_id):
+    client = app.test_client()
+    client.post('/login', data={'username': 'alice', 'password': 'pw'})
+    return socketio.test_client(app, flask_test_client=client)
+
+
+def resume(chat, order_id, last_seq):
+    chat.get_received()
+    chat.emit('resume_chat', {'orders': {str(order_id): last_seq}})
+    replays = [event['args'][0] for event in chat.get_received() if event['name'] == 'chat_replay']
+    assert len(replays) == 1
+    return replays[0]
+
+
+def test_resume_steps_past_a_sequence_number_that_was_never_stored(order_id, chat):
+    for text in ('one', 'two', 'three'):
+        assert 'seq' in chat.emit('send_message', {'order_id': order_id, 'message': text}, callback=True)
+    chat_buffer.flush()
+    # Number 2 was handed out but its message lost, e.g. by a worker that
+    # stopped with it buffered; that worker's memory went with it
+    with app.app_context():
+        ChatMessage.query.filter_by(order_id=order_id, seq=2).delete()
+        db.session.commit()
+    recent_chat.rooms.clear()
+
+    replay = resume(chat, order_id, 1)
+    assert [message['seq'] for message in replay['messages']] == [3]
+    assert replay['last_seq'] == 3
+    assert not replay['has_more']
+
+    # Resuming from where the replay left off finds nothing more to ask for
+    replay = resume(chat, order_id, replay['last_seq'])
+    assert replay['messages'] == []
+    assert replay['last_seq'] == 3
@@ -0,0 +1,228 @@
+"""
+Order counters behind the trending services endpoint.
+
+SlidingWindowCounter gives exact per-service counts over the last week:
+orders are counted in hourly buckets held in a ring buffer that covers the
+window, and a running total per service is kept alongside the buckets, so
+asking for the top services never rescans the orders.
+
+HotTracker gives the time-decayed "hot" ranking, overall and per category,
+from fixed-size heavy-hitter sketches.
+"""
+
+import heapq
+import threading
+from collections import Counter
+from datetime import datetime
+from operator import itemgetter
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def hour_of(timestamp):
+    """Return the absolute hour number of a naive UTC datetime"""
+    return int((timestamp - EPOCH).total_seconds() // 3600)
+
+
+class SlidingWindowCounter:
+    """Per-key event counts over the last window_hours, in hourly buckets"""
+
+    def __init__(self, window_hours=7 * 24):
+        self.window_hours = window_hours
+        self.lock = threading.Lock()
+        self.built = False
+        self._clear()
+
+    def _clear(self):
+        self.buckets = [Counter() for _ in range(self.window_hours)]
+        self.bucket_hours = [None] * self.window_hours  # absolute hour held in each slot
+        self.totals = Counter()
+        self.current_hour = None
+
+    def rebuild(self, events, now=None):
+        """Reset the counter from an iterable of (key, timestamp) pairs"""
+        with self.lock:
+            self._clear()
+            self._advance(hour_of(now or datetime.utcnow()))
+            for key, timestamp in events:
+                self._record(key, hour_of(timestamp), 1)
+            self.built = True
+
+    def record(self, key, timestamp=None, count=1):
+        """Count an event for key at timestamp (default now)"""
+        now_hour = hour_of(datetime.utcnow())
+        with self.lock:
+            self._advance(now_hour)
+            self._record(key, hour_of(timestamp) if timestamp else now_hour, count)
+
+    def _record(self, key, hour, count):
+        if hour <= self.current_hour - self.window_hours or hour > self.current_hour:
+            return
+        slot = hour % self.window_hours
+        if self.bucket_hours[slot] != hour:
+            self._expire(slot)
+            self.bucket_hours[slot] = hour
+        self.buckets[slot][key] += count
+        self.totals[key] += count
+
+    def _expire(self, slot):
+        for key, count in self.buckets[slot].items():
+            remaining = self.totals[key] - count
+            if remaining > 0:
+                self.totals[key] = remaining
+            else:
+                del self.totals[key]
+        self.buckets[slot] = Counter()
+        self.bucket_hours[slot] = None
+
+    def _advance(self, now_hour):
+        """Expire the buckets that have slid out of the window"""
+        if self.current_hour is not None and now_hour <= self.current_hour:
+            return
+        first = now_hour - self.window_hours + 1 if self.current_hour is None else self.current_hour + 1
+        for hour in range(max(first, now_hour - self.window_hours + 1), now_hour + 1):
+            slot = hour % self.window_hours
+            if self.bucket_hours[slot] is not None and self.bucket_hours[slot] != hour:
+                self._expire(slot)
+        self.current_hour = now_hour
+
+    def top(self, n, where=None):
+        """Return the n keys with the most events in the window as (key, count)
+
+        where, if given, is a predicate keys must satisfy to be considered.
+        """
+        now_hour = hour_of(datetime.utcnow())
+        with self.lock:
+            self._advance(now_hour)
+            items = self.totals.items()
+            if where is not None:
+                items = [(key, count) for key, count in items if where(key)]
+            return heapq.nlargest(n, items, key=itemgetter(1))
+
+    def count(self, key):
+        """Return the number of events for key in the window"""
+        with self.lock:
+            self._advance(hour_of(datetime.utcnow()))
+            return self.totals.get(key, 0)
+
+
+class DecayedSpaceSaving:
+    """Space-Saving heavy-hitter sketch over exponentially decayed counts
+
+    At most ``capacity`` items are tracked.  When a new item arrives and the
+    sketch is full, the item with the smallest count is replaced and the
+    newcomer inherits that count as its error.  For every reported item:
+
+        true weight <= estimate <= true weight + error,  error <= W / capacity
+
+    where W is the total decayed weight seen by the sketch, and every item
+    whose true weight exceeds W / capacity is guaranteed to be reported.
+
+    Decay uses forward decay: an event at time t is added with weight
+    2 ** ((t - landmark) / half_life), so older events never need touching.
+    Dividing by the weight of "now" turns the stored counts back into
+    scores where an order counts 1 now and 1/2 one half-life ago.  Counts
+    are rescaled and the landmark moved before the weights get large.
+    """
+
+    RESCALE_EXPONENT = 32
+
+    def __init__(self, capacity, half_life_hours, landmark=None):
+        self.capacity = capacity
+        self.half_life = half_life_hours * 3600.0
+        self.landmark = landmark or datetime.utcnow()
+        self.counts = {}   # item -> [decayed count, maximum overestimate]
+        self.total = 0.0
+
+    def _exponent(self, timestamp):
+        return (timestamp - self.landmark).total_seconds() / self.half_life
+
+    def add(self, item, timestamp, count=1):
+        exponent = self._exponent(timestamp)
+        if exponent > self.RESCALE_EXPONENT:
+            self._rescale(timestamp)
+            exponent = 0.0
+        weight = count * 2 ** exponent
+        self.total += weight
+
+        entry = self.counts.get(item)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = [weight, 0.0]
+        else:
+            victim = min(self.counts, key=lambda key: self.counts[key][0])
+            floor = self.counts.pop(victim)[0]
+            self.counts[item] = [floor + weight, floor]
+
+    def _rescale(self, timestamp):
+        factor = 2 ** -self._exponent(timestamp)
+        for entry in self.counts.values():
+            entry[0] *= factor
+            entry[1] *= factor
+        self.total *= factor
+        self.landmark = timestamp
+
+    def top(self, n, now):
+        """Return up to n (item, score, error) with the highest decayed scores"""
+        scale = 2 ** -self._exponent(now)
+        best = heapq.nlargest(n, self.counts.items(), key=lambda pair: pair[1][0])
+        return [(item, count * scale, error * scale) for item, (count, error) in best]
+
+
+class HotTracker:
+    """Time-decayed trending per category, in bounded memory
+
+    One DecayedSpaceSaving sketch is kept for the whole catalogue and one per
+    category, so memory is at most (max_categories + 1) * capacity counters
+    whatever the size of the catalogue or the order volume.  Orders in
+    categories beyond max_categories still count towards the global sketch.
+    """
+
+    def __init__(self, capacity=64, half_life_hours=24, max_categories=32):
+        self.capacity = capacity
+        self.half_life_hours = half_life_hours
+        self.max_categories = max_categories
+        self.lock = threading.Lock()
+        self.built = False
+        self._clear()
+
+    def _clear(self):
+        now = datetime.utcnow()
+        self.overall = DecayedSpaceSaving(self.capacity, self.half_life_hours, landmark=now)
+        self.categories = {}
+
+    def _sketch(self, category):
+        sketch = self.categories.get(category)
+        if sketch is None and category and len(self.categories) < self.max_categories:
+            sketch = self.categories[category] = DecayedSpaceSaving(
+                self.capacity, self.half_life_hours, landmark=self.overall.landmark
+            )
+        return sketch
+
+    def _record(self, service_id, category, timestamp):
+        self.overall.add(service_id, timestamp)
+        sketch = self._sketch(category)
+        if sketch is not None:
+            sketch.add(service_id, timestamp)
+
+    def rebuild(self, events):
+        """Reset from an iterable of (service_id, category, timestamp)"""
+        with self.lock:
+            self._clear()
+            for service_id, category, timestamp in sorted(events, key=itemgetter(2)):
+                self._record(service_id, category, timestamp)
+            self.built = True
+
+    def record(self, service_id, category, timestamp=None):
+        """Count an order for a service"""
+        with self.lock:
+            self._record(service_id, category, timestamp or datetime.utcnow())
+
+    def top(self, n, category=None):
+        """Return up to n (service_id, score, error), overall or for a category"""
+        with self.lock:
+            sketch = self.categories.get(category) if category else self.overall
+            if sketch is None:
+                return []
+            return sketch.top(n, datetime.utcnow())
@@ -0,0 +1,148 @@
+"""
+In-memory typeahead index for the live-search dropdown.
+
+Every word position of a service title is stored as a key in a sorted
+array, so a prefix lookup is two binary searches and a bounded slice.
+Popular searches are kept in a second sorted array so the dropdown can
+offer query completions as well as services.  Nothing here touches the
+database once the index is built.
+"""
+
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+from search import tokenize
+
+# Upper bound on the entries inspected per lookup, keeps short prefixes cheap
+MAX_SCAN = 500
+
+# Number of distinct searches remembered for query completion
+MAX_QUERIES = 5000
+
+# Sorts after any character that can follow a prefix in a key
+PREFIX_END = '\U0010ffff'
+
+# Sorts after every real rank tuple
+MAX_RANK = (True, float('inf'), 0)
+
+
+def normalize(text):
+    """Lowercase text and collapse it to single-space separated words"""
+    return ' '.join(tokenize(text))
+
+
+def title_entries(title, service_id):
+    """Return one entry per title word: the title suffix starting at it
+
+    'Logo Design' yields ('logo design', id, True) and ('design', id, False),
+    the flag marking the entry that starts at the beginning of the title.
+    """
+    words = tokenize(title)
+    return [(' '.join(words[i:]), service_id, i == 0) for i in range(len(words))]
+
+
+class TypeaheadIndex:
+    """Sorted-prefix-array index of service titles and popular searches"""
+
+    def __init__(self, max_scan=MAX_SCAN, max_queries=MAX_QUERIES):
+        self.max_scan = max_scan
+        self.max_queries = max_queries
+        self.lock = threading.Lock()
+        self.built = False
+        self.entries = []         # sorted (key, service_id, is_title_start)
+        self.services = {}        # service_id -> dropdown payload
+        self.query_keys = []      # sorted normalized searches
+        self.query_counts = Counter()
+
+    def rebuild(self, docs):
+        """Replace the indexed services, keeping the popular searches"""
+        with self.lock:
+            self.entries = []
+            self.services = {}
+            for doc in docs:
+                self.services[doc['id']] = self._payload(doc)
+                self.entries.extend(title_entries(doc['title'], doc['id']))
+            self.entries.sort()
+            self.built = True
+
+    def add(self, doc):
+        """Index (or re-index) a single service"""
+        with self.lock:
+            self._remove(doc['id'])
+            self.services[doc['id']] = self._payload(doc)
+            for entry in title_entries(doc['title'], doc['id']):
+                insort(self.entries, entry)
+
+    def remove(self, service_id):
+        """Drop a service from the index"""
+        with self.lock:
+            self._remove(service_id)
+
+    def _remove(self, service_id):
+        payload = self.services.pop(service_id, None)
+        if payload is None:
+            return
+        for entry in title_entries(payload['title'], service_id):
+            position = bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    @staticmethod
+    def _payload(doc):
+        # Only what the dropdown renders
+        return {
+            'id': doc['id'],
+            'title': doc['title'],
+            'price': doc['price'],
+            'freelancer': doc.get('freelancer'),
+        }
+
+    def record_query(self, query):
+        """Count a submitted search so it can be offered as a completion"""
+        key = normalize(query)
+        if not key:
+            return
+        with self.lock:
+            if key not in self.query_counts:
+                if len(self.query_counts) >= self.max_queries:
+                    self._prune_queries()
+                insort(self.query_keys, key)
+            self.query_counts[key] += 1
+
+    def _prune_queries(self):
+        # Forget the least popular half so the table stays bounded
+        keep = dict(self.query_counts.most_common(self.max_queries // 2))
+        self.query_counts = Counter(keep)
+        self.query_keys = sorted(keep)
+
+    def _range(self, array, low, high):
+        """Return up to max_scan items of a sorted array between low and high"""
+        start = bisect_left(array, low)
+        end = bisect_left(array, high, lo=start)
+        return array[start:min(end, start + self.max_scan)]
+
+    def suggest(self, query, limit=10):
+        """Return the top services and popular searches completing query"""
+        prefix = normalize(query)
+        if not prefix:
+            return {'services': [], 'queries': []}
+
+        with self.lock:
+            # Rank matches at the start of the title first, then shorter and
+            # newer titles; a service matching at several words counts once.
+            best = {}
+            for key, service_id, is_title_start in self._range(
+                self.entries, (prefix,), (prefix + PREFIX_END,)
+            ):
+                rank = (not is_title_start, len(key), -service_id)
+                if rank < best.get(service_id, MAX_RANK):
+                    best[service_id] = rank
+            top_ids = heapq.nsmallest(limit, best, key=best.__getitem__)
+            services = [self.services[service_id] for service_id in top_ids]
+
+            matches = self._range(self.query_keys, prefix, prefix + PREFIX_END)
+            queries = heapq.nlargest(limit, matches, key=lambda key: (self.query_counts[key], -len(key)))
+
+        return {'services': services, 'queries': queries}
@@ -0,0 +1,89 @@
+"""
+Change counters behind conditional GETs.
+
+Every write bumps the tags of what it changed ("service:12", "stats:3",
+"notifications:7", ...).  The versions live in the database: a transaction
+bumps its tags' rows as it commits, so every worker - and a restarted one -
+numbers the same data the same way, and an ETag one worker handed out is
+still current on another.
+
+Each process keeps the versions it has seen in memory.  A tag is read from
+the database the first time it is needed and from then on kept up to date
+by the process's own commits and by the versions other workers relay over
+the message queue, so ETags are answered without reading the data or
+rendering anything.  A response's version is the sum over its tags, which
+grows whenever any of them is bumped; Last-Modified is the time of the
+latest bump.
+"""
+
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+
+class ChangeCounters:
+    """Version number and modification time per tag
+
+    load(tags) returns {tag: (version, modified at)} for the tags that have
+    a row in the database; a tag without one has never changed.
+    """
+
+    def __init__(self, load=None):
+        self.load = load
+        self.lock = threading.Lock()
+        self.versions = {}  # tag -> (version, modified at or None)
+        self.started_at = datetime.utcnow()
+        self.started = self.started_at.replace(microsecond=0)
+
+    def record(self, versions):
+        """Note {tag: (version, modified at)} committed here or relayed by another worker"""
+        with self.lock:
+            for tag, (version, modified) in versions.items():
+                known = self.versions.get(tag)
+                # Loaded and relayed versions can arrive out of order
+                if known is None or version > known[0]:
+                    self.versions[tag] = (version, modified)
+
+    def entries(self, tags, load=True):
+        """Return [(version, modified at or None)] for the tags, in order"""
+        tags = list(tags)
+        with self.lock:
+            missing = [tag for tag in tags if tag not in self.versions]
+        if missing and load and self.load is not None:
+            loaded = self.load(missing)
+            self.record({tag: loaded.get(tag, (0, None)) for tag in missing})
+        with self.lock:
+            return [self.versions.get(tag, (0, None)) for tag in tags]
+
+    def state(self, tags, load=True):
+        """Return (version, last modified) over the given tags
+
+        With load=False, tags this process has not seen yet count as
+        version 0 instead of being read from the database.
+        """
+        version, modified = 0, self.started
+        for tag_version, tag_modified in self.entries(tags, load):
+            version += tag_version
+            if tag_modified is not None:
+                modified = max(modified, tag_modified)
+        return version, modified.replace(microsecond=0)
+
+    def changed_within(self, tags, seconds):
+        """Whether any of the tags may have changed in the last seconds
+
+        A process only hears of other workers' changes from the moment it
+        starts listening, so a new process assumes everything changed until
+        seconds have passed.
+        """
+        since = datetime.utcnow() - timedelta(seconds=seconds)
+        if self.started_at > since:
+            return True
+        return any(modified is not None and modified > since for _, modified in self.entries(tags))
+
+    def etag(self, tags, extra=''):
+        """Return (weak ETag value, last modified) for a response showing tags"""
+        tags = list(tags)
+        version, modified = self.state(tags)
+        # The tag names go in too, so two users' version-0 responses differ
+        scope = zlib.crc32(('|'.join(tags) + '|' + str(extra)).encode())
+        return '%d-%08x' % (version, scope), modified
@@ -0,0 +1,24 @@
+"""
+WSGI entry point for gunicorn.
+
+Several workers need a shared Socket.IO message queue and the websocket
+transport (long-polling would need sticky sessions), e.g.:
+
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 \
+    gunicorn -k geventwebsocket.gunicorn.workers.GeventWebSocketWorker --workers 4 wsgi:app
+
+Every worker imports this module, so the schema is upgraded before they
+start, once, with `flask --app app migrate` (see Procfile).
+"""
+
+from app import app, db, engine_settings, load_indexes, migrations
+
+with app.app_context():
+    pending = migrations.pending(db.engine)
+    if pending:
+        raise RuntimeError('Database has %d pending migrations; run `flask --app app migrate` first' % len(pending))
+    print('Database engine: ' + ', '.join(engine_settings()), flush=True)
+    load_indexes()
+
+if __name__ == '__main__':
+    app.run()
@@ -17,8 +17,10 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:/
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 
-# Initialize SocketIO for real-time features
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Initialize SocketIO for real-time features. Running more than one worker
+# needs a shared message queue (e.g. redis://...) so emits reach every worker.
+socketio = SocketIO(app, cors_allowed_origins="*",
+                    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None)
 
 db = SQLAlchemy(app)
 login_manager = LoginManager()
@@ -47,7 +47,8 @@ document.addEventListener('DOMContentLoaded', function() {
  */
 function initializeSocket() {
     try {
-        socket = io();
+        // Websocket only, so workers behind the queue need no sticky sessions
+        socket = io({ transports: ['websocket'] });
         
         socket.on('connect', function() {
             console.log('Socket connected successfully');